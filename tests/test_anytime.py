@@ -0,0 +1,102 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+# effects after moving into a node with this map character
+def moved_into(name, effects):
+    t1_effect, t2_effect, r1_effect, r2_effect = effects
+    if name == "r1":
+        r1_effect *= 0.5
+    elif name == "r2":
+        r2_effect *= 0.5
+    elif name == "t1":
+        t1_effect *= 2
+    elif name == "t2":
+        t2_effect *= 2
+    return t1_effect, t2_effect, r1_effect, r2_effect
+
+
+# cost of a path by the game rules, worked out from the map characters instead of the compiled tables
+# a node landed on both by a move and by a trap 3 push back is taken the way leaving the smaller multipliers
+def path_cost(path, compiled, effects):
+    energy = 0.0
+    steps = 0.0
+    for (q, r), end in zip(path, path[1:]):
+        energy += effects[0] * effects[2]
+        steps += effects[1] * effects[3]
+        ways = []
+        for (i, j) in hunt.DIRECTIONS[q % 2]:
+            if not compiled.is_open(q + i, r + j):
+                continue
+            name = compiled.name(q + i, r + j)
+            if name == "t3":
+                landings = hunt.handle_trap_3(q + i, r + j, compiled, i, j)
+            else:
+                landings = [(q + i, r + j)]
+            if tuple(end) in landings:
+                ways.append(moved_into(name, effects))
+        assert len(ways) > 0, str(end) + " cannot be reached from " + str((q, r))
+        effects = min(ways, key=lambda way: way[0] * way[2] + way[1] * way[3])
+    return energy, steps, effects
+
+
+class Improved(hunt.Reporter):
+    def __init__(self):
+        self.results = []
+
+    def on_improved(self, result):
+        self.results.append(result)
+
+
+@pytest.mark.parametrize("seed", [3, 18, 25])
+@pytest.mark.parametrize("heuristic", ["euclidean", "hex"])
+def test_anytime_paths_cost_what_they_report(seed, heuristic):
+    map, start, treasures = hunt.generate_map(seed, 40, 30)
+    compiled = hunt.CompiledMap(map)
+    state = hunt.SearchState(compiled.max_q, compiled.max_r)
+    for tsr in treasures:
+        reporter = Improved()
+        result = hunt.solve(compiled, start, tsr, reporter=reporter, heuristic=heuristic, epsilon=1.0)
+        hunt.distance_field(start, compiled, 1.0, 1.0, 1.0, 1.0, state)
+        field = hunt.field_leg(state, tsr)
+        assert (result is None) == (field is None)
+        if result is None:
+            continue
+        assert reporter.results[-1].path == result.path
+        for improved in reporter.results:
+            assert improved.path[0] == tuple(start) and improved.path[-1] == tuple(tsr)
+            energy, steps, effects = path_cost(improved.path, compiled, (1.0, 1.0, 1.0, 1.0))
+            assert improved.energy == pytest.approx(energy)
+            assert improved.steps == pytest.approx(steps)
+            assert improved.effects == pytest.approx(effects)
+            # the bound holds against any path there is, such as the one distance_field finds
+            assert improved.cost <= improved.bound * (field[1] + field[2]) + 1e-9
+
+
+@pytest.mark.parametrize("budget", [0.0, 0.01, 1.0])
+def test_anytime_paths_cost_no_more_than_a_plain_search(budget):
+    map, start, treasures = hunt.game_map()
+    compiled = hunt.CompiledMap(map)
+    effects = (1.0, 1.0, 1.0, 1.0)
+    for tsr in treasures:
+        plain = hunt.solve(compiled, start, tsr, *effects)
+        result = hunt.solve(compiled, start, tsr, *effects, budget=budget)
+        assert result.cost <= plain.cost
+        hunt.mark_path(plain.path, compiled)
+        start, effects = plain.end, plain.effects
+
+
+def test_anytime_paths_keep_improving_until_the_budget_runs_out():
+    map, start, treasures = hunt.generate_map(5, 64, 64)
+    compiled = hunt.CompiledMap(map)
+    plain = hunt.solve(compiled, start, treasures[0])
+    result = hunt.solve(compiled, start, treasures[0], budget=60.0)
+    # given the time, the search ends with the cheapest path
+    assert result.cost <= plain.cost and result.bound == 1.0
+    assert result.cost == pytest.approx(hunt.solve(compiled, start, treasures[0], effect_aware=True).cost)
@@ -0,0 +1,30 @@
+import importlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_bad_instances_get_an_error_record():
+    map, start, treasures = hunt.game_map()
+    bad = [{"id": 0, "map": [[" "]], "start": [5, 5], "treasures": []},
+           {"id": 1, "map": map, "start": [2, 2], "treasures": []},
+           {"id": 2, "map": map, "start": [0, 0], "treasures": treasures, "effects": [1.0, 1.0, 1.0]},
+           {"id": 3, "map": map, "start": [0, 0], "treasures": treasures, "effects": 2.0}]
+    for instance in bad:
+        solved = hunt.solve_instance(instance)
+        assert sorted(solved) == ["error", "id"] and solved["id"] == instance["id"]
+        assert solved["error"].startswith("ValueError: ")
+    solved = hunt.solve_instance({"map": [[" "]], "start": [0, 0], "treasures": [], "effects": [2, 1, 1, 1]})
+    assert solved["cost"] == 0 and solved["path"] == [(0, 0)] and solved["effects"] == (2, 1, 1, 1)
+
+
+def test_batches_solve_every_line_in_order():
+    map, start, treasures = hunt.game_map()
+    instance = {"map": map, "start": list(start), "treasures": treasures}
+    lines = [json.dumps(dict(instance, id=i)) for i in range(5)] + ["not json"]
+    results = list(hunt.batch_solve(lines, workers=1, chunk_size=2))
+    assert [result["id"] for result in results] == [0, 1, 2, 3, 4, None]
+    assert all(result["cost"] == 27.0 for result in results[:5]) and "error" in results[5]
@@ -0,0 +1,31 @@
+import copy
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_generated_maps_depend_only_on_their_seed():
+    first = hunt.generate_map(11, 30, 20, obstacles=0.2, traps=0.1, rewards=0.1, treasures=6)
+    assert hunt.generate_map(11, 30, 20, obstacles=0.2, traps=0.1, rewards=0.1, treasures=6) == first
+    assert hunt.generate_map(12, 30, 20, obstacles=0.2, traps=0.1, rewards=0.1, treasures=6) != first
+    map, start, treasures = first
+    names = [name for row in map for name in row]
+    assert names.count("o") + names.count("t4") == 120 and names.count("r1") + names.count("r2") == 60
+    assert map[start[1]][start[0]] == "p" and len(treasures) == 6
+    assert all(map[r][q] == "g" for (q, r) in treasures)
+    with pytest.raises(ValueError):
+        hunt.generate_map(0, 4, 4, obstacles=0.9)
+
+
+def test_a_case_that_does_more_work_is_a_regression():
+    report = {"cases": [hunt.bench_case({"name": "tiny", "seed": 3, "max_q": 12, "max_r": 8})]}
+    assert hunt.compare_reports(report, report) == ([], 0)
+    worse = copy.deepcopy(report)
+    worse["cases"][0]["search"]["expanded"] += 1
+    lines, regressions = hunt.compare_reports(worse, report)
+    assert regressions == 1 and "search.expanded regressed" in lines[0]
@@ -0,0 +1,36 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_a_changed_map_never_gets_a_path_found_before_the_change():
+    map, start, treasures = hunt.game_map()
+    compiled = hunt.CompiledMap(map)
+    cache = hunt.PathCache()
+    first = hunt.solve(compiled, start, treasures[0], cache=cache)
+    assert hunt.solve(compiled, start, treasures[0], cache=cache) is first
+    # block the path found and the cached one must not come back
+    q, r = first.path[1]
+    name = compiled.name(q, r)
+    compiled.set_tile(q, r, "o")
+    second = hunt.solve(compiled, start, treasures[0], cache=cache)
+    assert second is not first and (q, r) not in second.path
+    # setting the node back gives the same map, and its result again
+    compiled.set_tile(q, r, name)
+    assert hunt.solve(compiled, start, treasures[0], cache=cache) is first
+    assert cache.stats() == {"hits": 2, "misses": 2, "evictions": 0, "size": 2}
+
+
+def test_the_least_recently_used_result_is_dropped():
+    map, start, treasures = hunt.game_map()
+    compiled = hunt.CompiledMap(map)
+    cache = hunt.PathCache(size=2)
+    results = [hunt.solve(compiled, start, tsr, cache=cache) for tsr in treasures[:2]]
+    assert hunt.solve(compiled, start, treasures[0], cache=cache) is results[0]
+    hunt.solve(compiled, start, treasures[2], cache=cache)
+    assert hunt.solve(compiled, start, treasures[0], cache=cache) is results[0]
+    assert hunt.solve(compiled, start, treasures[1], cache=cache) is not results[1]
+    assert cache.stats()["evictions"] == 2 and len(cache) == 2
@@ -0,0 +1,31 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_hierarchical_paths_cost_a_little_more_than_plain_ones():
+    for seed in range(4):
+        # with no traps or rewards the hex estimate finds the cheapest path
+        map, start, treasures = hunt.generate_map(seed, 48, 48, traps=0, rewards=0)
+        compiled = hunt.CompiledMap(map)
+        clusters = hunt.ClusterMap(compiled, size=8)
+        whole = hunt.ClusterMap(compiled, size=48)
+        for tsr in treasures:
+            plain = hunt.solve(compiled, start, tsr, heuristic="hex")
+            found = hunt.solve(compiled, start, tsr, clusters=clusters, heuristic="hex")
+            assert plain.cost <= found.cost <= 1.25 * plain.cost
+            # one cluster over the whole map searches it like find_path
+            assert hunt.solve(compiled, start, tsr, clusters=whole, heuristic="hex").path == plain.path
+
+
+def test_sparse_states_search_like_flat_ones():
+    map, start, treasures = hunt.generate_map(3, 40, 30, rewards=0.1, traps=0.1)
+    compiled = hunt.CompiledMap(map)
+    sparse = hunt.SparseState(compiled.max_q, compiled.max_r)
+    for tsr in treasures:
+        flat = hunt.find_path(start, tsr, compiled, 1.0, 1.0, 1.0, 1.0, hunt.SearchState(40, 30))
+        assert hunt.find_path(start, tsr, compiled, 1.0, 1.0, 1.0, 1.0, sparse) == flat
+        assert len(sparse.stamp) < compiled.max_q * compiled.max_r
@@ -0,0 +1,33 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+# open neighbours of every node in [N, NE, SE, S, SW, NW] order, read from the map
+def open_neighbours(compiled):
+    table = []
+    for n in range(compiled.max_q * compiled.max_r):
+        r, q = divmod(n, compiled.max_q)
+        table.append([(r + j) * compiled.max_q + q + i for (i, j) in hunt.DIRECTIONS[q % 2]
+                      if compiled.is_open(q + i, r + j)])
+    return table
+
+
+def neighbour_table(compiled):
+    return [list(compiled.neighbours[n * 6:n * 6 + compiled.degree[n]]) for n in range(compiled.max_q * compiled.max_r)]
+
+
+def test_the_neighbour_table_follows_set_tile():
+    map, start, treasures = hunt.generate_map(4, 12, 9, traps=0.2)
+    compiled = hunt.CompiledMap(map)
+    assert compiled.neighbours.itemsize == 4 and compiled.landing.itemsize == 4
+    assert neighbour_table(compiled) == open_neighbours(compiled)
+    for (q, r, name) in [(5, 4, "o"), (6, 4, "t3"), (5, 4, " "), (6, 4, "t4")]:
+        compiled.set_tile(q, r, name)
+        assert neighbour_table(compiled) == open_neighbours(compiled)
+        # the table matches a map compiled afresh, landings of trap 3 push backs included
+        fresh = hunt.CompiledMap.from_tiles(compiled.tiles, compiled.max_q)
+        assert compiled.neighbours == fresh.neighbours and compiled.landing == fresh.landing
@@ -0,0 +1,32 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_cost_matrix_legs_are_the_cheapest_paths_between_the_points():
+    for seed in range(4):
+        # traps other than t3 and rewards make the cheapest path depend on more than the node, leave them out
+        map, start, treasures = hunt.generate_map(seed, 20, 16, traps=0.15, rewards=0, treasures=5)
+        map = [["t3" if name in ("t1", "t2") else name for name in row] for row in map]
+        compiled = hunt.CompiledMap(map)
+        state = hunt.SearchState(compiled.max_q, compiled.max_r)
+        legs = hunt.cost_matrix(compiled, start, treasures, state)
+        points = [start] + treasures
+        for a in range(len(points)):
+            assert legs[a][0] is None and legs[a][a] is None
+            for b in range(1, len(points)):
+                if a == b:
+                    continue
+                found = hunt.find_path(points[a], points[b], compiled, 1.0, 1.0, 1.0, 1.0, state)
+                if found is None:
+                    assert legs[a][b] is None
+                    continue
+                leg = legs[a][b]
+                assert leg[0][0] == points[a] and leg[0][-1] == points[b]
+                # find_path stops at the first way onto the treasure, the effect aware search finds the cheapest
+                cheapest = hunt.solve(compiled, points[a], points[b], effect_aware=True)
+                assert leg[1] + leg[2] == cheapest.cost <= found[1] + found[2]
+                assert hunt.walk_path(leg[0], compiled, 1.0, 1.0, 1.0, 1.0)[:2] == (leg[1], leg[2])
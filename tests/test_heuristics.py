@@ -0,0 +1,42 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_landmarks_expand_fewer_nodes_than_hex_distance():
+    map, start, treasures = hunt.generate_map(2, 64, 64, obstacles=0.3, rewards=0.002, treasures=3)
+    compiled = hunt.CompiledMap(map)
+    hex_result = hunt.solve(compiled, start, treasures[0], heuristic="hex")
+    alt_result = hunt.solve(compiled, start, treasures[0], heuristic=hunt.LandmarkHeuristic())
+    assert alt_result.expanded < hex_result.expanded
+    assert alt_result.cost == pytest.approx(hex_result.cost)
+
+
+def test_hex_estimate_grows_with_the_distance_away_from_rewards():
+    map = [[" "] * 40 for _ in range(40)]
+    for q in range(0, 40, 2):
+        map[0][q] = "r1"
+    compiled = hunt.CompiledMap(map)
+    heuristic = hunt.HexHeuristic()
+    heuristic.prepare(compiled, (20, 39))
+    # the rewards in the first row are out of reach of the first moves from the middle of the map
+    energy, steps = heuristic.estimate(20, 20, 1.0, 1.0, 1.0, 1.0)
+    assert energy == pytest.approx(19.0) and steps == pytest.approx(19.0)
+    energy, steps = heuristic.estimate(20, 0, 1.0, 1.0, 1.0, 1.0)
+    assert energy < 3.0 and steps == pytest.approx(39.0)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_hex_and_landmark_estimates_never_overestimate(seed):
+    map, start, treasures = hunt.generate_map(seed, 24, 24, rewards=0.1)
+    compiled = hunt.CompiledMap(map)
+    for name in ("hex", "alt"):
+        heuristic = hunt.heuristic_for(name)
+        heuristic.prepare(compiled, treasures[0])
+        result = hunt.solve(compiled, start, treasures[0], effect_aware=True)
+        assert sum(heuristic.estimate(*start, 1.0, 1.0, 1.0, 1.0)) <= result.cost + 1e-9
@@ -0,0 +1,24 @@
+import importlib
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_repaired_fields_match_distance_field():
+    for seed in range(6):
+        map, start, treasures = hunt.generate_map(seed, 15, 12, traps=0.15, rewards=0.1)
+        compiled = hunt.CompiledMap(map)
+        planner = hunt.IncrementalPlanner(compiled, start, 1.0, 2.0, 0.5, 1.0)
+        state = hunt.SearchState(compiled.max_q, compiled.max_r)
+        rng = random.Random(seed)
+        for _ in range(12):
+            field = hunt.distance_field(start, compiled, 1.0, 2.0, 0.5, 1.0, state)
+            assert planner.field() == field
+            for tsr in treasures:
+                assert planner.leg(tsr) == hunt.field_leg(state, tsr)
+            q, r = rng.randrange(compiled.max_q), rng.randrange(compiled.max_r)
+            if (q, r) != tuple(start):
+                planner.set_tile(q, r, rng.choice(["o", " ", "t1", "t3", "t4", "r1", "r2"]))
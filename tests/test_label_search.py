@@ -0,0 +1,67 @@
+import heapq
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+# cheapest cost from start to tsr by Dijkstra over every (node, trap and reward effects, rewards used up) state
+def cheapest(compiled, start, tsr):
+    max_q = compiled.max_q
+    open_list = [(0.0, 0, (start[1] * max_q + start[0], 1.0, 1.0, 1.0, 1.0, frozenset()))]
+    settled = set()
+    pushed = 0
+    while len(open_list) > 0:
+        cost, _, state = heapq.heappop(open_list)
+        if state in settled:
+            continue
+        settled.add(state)
+        cur, t1, t2, r1, r2, used = state
+        if cur == tsr[1] * max_q + tsr[0]:
+            return cost
+        r, q = divmod(cur, max_q)
+        for (i, j) in hunt.DIRECTIONS[q % 2]:
+            if not compiled.is_open(q + i, r + j):
+                continue
+            name = compiled.name(q + i, r + j)
+            tile = hunt.TILE_CODES[name]
+            effects = (t1, t2, r1, r2)
+            used_new = used
+            if name in ("r1", "r2") and (q + i, r + j) not in used:
+                effects = (t1, t2) + hunt.handle_reward(tile, r1, r2)
+                used_new = used | {(q + i, r + j)}
+            elif name in ("t1", "t2"):
+                effects = hunt.handle_trap_1_2(tile, t1, t2) + (r1, r2)
+            landings = hunt.handle_trap_3(q + i, r + j, compiled, i, j) if name == "t3" else [(q + i, r + j)]
+            for (land_q, land_r) in landings:
+                pushed += 1
+                heapq.heappush(open_list, (cost + t1 * r1 + t2 * r2, pushed,
+                                           (land_r * max_q + land_q,) + effects + (used_new,)))
+    return float("inf")
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_effect_aware_search_finds_the_cheapest_path(seed):
+    map, start, treasures = hunt.generate_map(seed, 5, 4, rewards=0.2, traps=0.1)
+    compiled = hunt.CompiledMap(map)
+    for tsr in treasures:
+        result = hunt.solve(compiled, start, tsr, effect_aware=True)
+        expected = cheapest(compiled, start, tsr)
+        assert (result is None) == (expected == float("inf"))
+        if result is not None:
+            assert result.cost == pytest.approx(expected)
+
+
+def test_label_limit_returns_a_path_no_dearer_than_find_path(monkeypatch):
+    map, start, treasures = hunt.generate_map(1, 64, 64)
+    compiled = hunt.CompiledMap(map)
+    unlimited = hunt.solve(compiled, start, treasures[0], effect_aware=True)
+    monkeypatch.setattr(hunt, "LABEL_LIMIT", 2000)
+    result = hunt.solve(compiled, start, treasures[0], effect_aware=True)
+    found = hunt.find_path(start, treasures[0], compiled, 1.0, 1.0, 1.0, 1.0, hunt.SearchState(64, 64))
+    assert unlimited.cost <= result.cost <= found[1] + found[2]
+    assert result.expanded < unlimited.expanded
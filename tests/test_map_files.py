@@ -0,0 +1,35 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_saved_maps_load_with_their_nodes(tmp_path, binary):
+    map, start, treasures = hunt.game_map()
+    compiled = hunt.CompiledMap(map)
+    compiled.set_tile(*start, "p")
+    path = str(tmp_path / "map")
+    hunt.save_map(compiled, path, binary)
+    loaded, loaded_start, loaded_treasures, traps = hunt.load_map(path)
+    assert loaded.tiles == compiled.tiles and loaded.landing == compiled.landing
+    # nodes are found in row order
+    nodes = [(q, r) for r in range(compiled.max_r) for q in range(compiled.max_q)]
+    assert loaded_start == start and loaded_treasures == [node for node in nodes if compiled.name(*node) == "g"]
+    for name in ("t1", "t2", "t3", "t4"):
+        assert traps[name] == [node for node in nodes if compiled.name(*node) == name]
+
+
+def test_binary_maps_are_checked_once(tmp_path):
+    path = str(tmp_path / "map")
+    with open(path, "wb") as target:
+        target.write(hunt.MAP_HEADER.pack(hunt.MAP_MAGIC, 3, 2) + bytes([0, 0, 0, 0, 42, 0]))
+    with pytest.raises(ValueError, match=r"unknown node code 42 at \(1, 1\)"):
+        hunt.load_map(path)
+    tiles = bytearray(6)
+    assert hunt.CompiledMap.from_tiles(tiles, 3, trusted=True).tiles is tiles
+    assert hunt.CompiledMap.from_tiles(tiles, 3).tiles is not tiles
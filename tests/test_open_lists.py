@@ -0,0 +1,19 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_open_lists_find_the_same_paths():
+    map, start, treasures = hunt.generate_map(2, 30, 30, traps=0.1, rewards=0.1)
+    compiled = hunt.CompiledMap(map)
+    for tsr in treasures:
+        heap = hunt.HeapQueue()
+        indexed = hunt.IndexedHeap()
+        plain = hunt.solve(compiled, start, tsr, queue=heap)
+        assert hunt.solve(compiled, start, tsr, queue=indexed).path == plain.path
+        # the indexed heap lowers keys in place where the plain heap leaves stale entries behind
+        assert indexed.stats()["stale_skipped"] == 0
+        assert heap.stats()["stale_skipped"] <= heap.stats()["decrease_keys"] == indexed.stats()["decrease_keys"]
@@ -0,0 +1,30 @@
+import importlib
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_evaluate_orders_finds_the_cheapest_order_followed():
+    map, start, treasures = hunt.generate_map(9, 20, 16, traps=0.1, rewards=0.1, treasures=4)
+    compiled = hunt.CompiledMap(map)
+    state = hunt.SearchState(compiled.max_q, compiled.max_r)
+    effects = (1.0, 1.0, 1.0, 1.0)
+    order, cost = hunt.evaluate_orders(compiled, start, treasures, workers=1, chunk_size=5)
+
+    # every order followed in this process, the earliest cheapest one wins
+    followed = {}
+    for candidate in itertools.permutations(treasures):
+        result = hunt.follow_order(compiled.copy(), start, candidate, *effects, state)
+        followed[candidate] = hunt.INF if result is None else result[1] + result[2]
+    cheapest = min(followed, key=lambda candidate: followed[candidate])
+    assert order == list(cheapest) and cost == followed[cheapest]
+
+    # Held-Karp finds the cheapest order of the legs searched on the unchanged map, following it costs no less
+    legs = hunt.cost_matrix(compiled, start, treasures, state)
+    planned, label = hunt.held_karp(legs, effects)
+    assert hunt.tour_cost(label) == min(hunt.tour_cost(hunt.tour_label(legs, list(candidate), effects))
+                                        for candidate in itertools.permutations(range(1, len(treasures) + 1)))
+    assert cost <= followed[tuple(treasures[b - 1] for b in planned)]
@@ -0,0 +1,32 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_optimal_order_costs_no_more_than_any_order_scored():
+    map, start, treasures = hunt.game_map()
+    compiled = hunt.CompiledMap(map)
+    plan = hunt.plan_tour(compiled, start, treasures)
+    order, cost = hunt.evaluate_orders(compiled, start, treasures, workers=1)
+    assert plan[2] + plan[3] <= cost
+    assert plan[2] + plan[3] == pytest.approx(23.5)
+    # the plan is what following its order costs
+    followed = hunt.follow_order(compiled.copy(), start, plan[0], 1.0, 1.0, 1.0, 1.0, hunt.SearchState(10, 6))
+    assert followed[1] + followed[2] == pytest.approx(plan[2] + plan[3])
+
+
+def test_optimal_planner_plays_the_planned_order():
+    map, start, treasures = hunt.game_map()
+    order, results, total_e, total_s = hunt.hunt(map, start, treasures, planner="optimal")
+    assert sorted(order) == sorted(treasures)
+    assert total_e + total_s == pytest.approx(23.5)
+
+
+def test_an_empty_tour_is_planned():
+    map, start, treasures = hunt.game_map()
+    assert hunt.plan_tour(map, start, []) == ([], [], 0, 0)
@@ -0,0 +1,41 @@
+import importlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_viewports_draw_only_the_nodes_inside_them():
+    map = [[" "] * 10 for _ in range(6)]
+    map[2][4] = "g"
+    map[5][9] = "r1"
+    map[0][2] = "t3"
+    compiled = hunt.CompiledMap(map)
+    whole = hunt.render_map(map)
+    assert hunt.render_map(compiled) == whole == hunt.render_map(map, (0, 0, 10, 6))
+    assert "  g " in whole and " r1 " in whole and " t3 " in whole
+
+    # q_from moves back to the even column 2, drawing columns 2 to 6 of rows 1 to 3
+    lines = list(hunt.render_lines(compiled, (3, 1, 7, 4)))
+    assert len(lines) == 2 + 2 * 3
+    drawn = "\n".join(lines)
+    assert "  g " in drawn and " r1 " not in drawn and " t3 " not in drawn
+    # five columns, two of them odd
+    assert lines[0] == "     " + " ____     " * 2 and lines[-1] == "\\____/    " * 3
+
+    file = io.StringIO()
+    hunt.write_map(compiled, file, (3, 1, 7, 4))
+    assert file.getvalue() == drawn + "\n"
+    for viewport in [(0, 0, 11, 6), (4, 4, 4, 6), (0, -1, 3, 3)]:
+        with pytest.raises(ValueError):
+            hunt.render_map(map, viewport)
+
+
+def test_path_viewports_stay_on_the_map():
+    assert hunt.path_viewport([(1, 1), (3, 2)], 10, 6) == (0, 0, 6, 5)
+    assert hunt.path_viewport([(8, 5)], 10, 6, margin=1) == (7, 4, 10, 6)
+    assert hunt.path_viewport([], 10, 6) == (0, 0, 10, 6)
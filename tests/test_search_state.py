@@ -0,0 +1,29 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_a_reused_state_searches_like_a_fresh_one():
+    map, start, treasures = hunt.generate_map(6, 25, 20, traps=0.1, rewards=0.1)
+    compiled = hunt.CompiledMap(map)
+    state = hunt.SearchState(compiled.max_q, compiled.max_r)
+    for tsr in treasures + treasures[::-1]:
+        fresh = hunt.find_path(start, tsr, compiled, 1.0, 1.0, 1.0, 1.0, hunt.SearchState(25, 20))
+        assert hunt.find_path(start, tsr, compiled, 1.0, 1.0, 1.0, 1.0, state) == fresh
+
+
+def test_cells_forget_the_last_search_even_when_the_generation_wraps():
+    state = hunt.SearchState(4, 3)
+    state.generation = 0xFFFFFFFF - 2
+    state.reset()
+    hunt.update_total(state, 1, 2, 3.0, 1.0, 4.0)
+    hunt.update_parent(state, 1, 2, 0, 2)
+    state.close(1, 2)
+    assert state.total_f[state.cell(1, 2)] == 4.0 and state.parent_of(1, 2) == (0, 2) and state.is_closed(1, 2)
+    # the stamps are cleared before they wrap around
+    state.reset()
+    assert state.generation == 1
+    assert state.total_f[state.cell(1, 2)] == hunt.INF and not state.is_closed(1, 2)
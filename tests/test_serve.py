@@ -0,0 +1,51 @@
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+# answers of a service with one worker to the given JSON lines, as serve writes them
+def serve_lines(compiled, lines, timeout=hunt.SERVICE_TIMEOUT):
+    service = hunt.QueryService(compiled, workers=1, timeout=timeout).start()
+    lines = [line.encode() + b"\n" for line in lines] + [b""]
+    answers = []
+
+    async def readline():
+        return lines.pop(0)
+
+    try:
+        asyncio.run(service.serve_lines(readline, answers.append))
+    finally:
+        service.close()
+    return answers, service.stats()
+
+
+def test_every_query_gets_an_answer():
+    map, start, treasures = hunt.generate_map(7, 20, 20)
+    compiled = hunt.CompiledMap(map)
+    good = {"start": list(start), "treasure": list(treasures[0])}
+    queries = [dict(good, id=0), dict(good, id=1, start=[[0, 0]]), dict(good, id=2, heuristic=["x"]),
+               dict(good, id=3, effects={"t1": 1}), dict(good, id=4, treasure=[0.5, 1]),
+               dict(good, id=5, effect_aware="yes"), dict(good, id=6, budget=[1]), dict(good, id=7)]
+    answers, stats = serve_lines(compiled, [json.dumps(query) for query in queries])
+    answers = {answer["id"]: answer for answer in answers}
+    assert sorted(answers) == list(range(8))
+    for i in range(1, 7):
+        assert answers[i]["error"].startswith("ValueError")
+    assert answers[0]["path"] == answers[7]["path"]
+    assert stats["answered"] == 8 and stats["failed"] == 6
+
+
+def test_effect_aware_queries_end_before_the_timeout():
+    map, start, treasures = hunt.generate_map(5, 40, 40)
+    compiled = hunt.CompiledMap(map)
+    query = {"id": 0, "start": list(start), "treasure": list(treasures[0]), "effect_aware": True}
+    began = time.perf_counter()
+    answers, stats = serve_lines(compiled, [json.dumps(query)], timeout=0.5)
+    assert time.perf_counter() - began < 2.0
+    assert "path" in answers[0] and stats["timeouts"] == 0
@@ -0,0 +1,41 @@
+import gc
+import importlib
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+def test_snapshots_read_the_map_as_it_was():
+    compiled = hunt.CompiledMap([[" "] * 6 for _ in range(4)])
+    first = compiled.snapshot()
+    compiled.set_tile(1, 1, "o")
+    second = compiled.snapshot()
+    compiled.set_tile(1, 1, "r1")
+    compiled.set_tile(2, 3, "t3")
+    assert first[1][1] == " " and first[3][2] == " "
+    assert second[1][1] == "o" and second[3][2] == " "
+    compiled.set_tile(2, 3, "t1")
+    assert first[3][2] == " " and second[3][2] == " "
+    assert compiled.name(1, 1) == "r1" and compiled.name(2, 3) == "t1"
+
+
+def test_the_journal_only_keeps_what_live_snapshots_read():
+    compiled = hunt.CompiledMap([[" "] * 6 for _ in range(4)])
+    first = compiled.snapshot()
+    compiled.set_tile(0, 0, "o")
+    second = compiled.snapshot()
+    compiled.set_tile(1, 0, "o")
+    assert len(compiled.journal) == 2
+    # worker processes get the map pickled, without the snapshots living here
+    assert pickle.loads(pickle.dumps(compiled)).journal is None
+    del first
+    gc.collect()
+    assert len(compiled.journal) == 1 and second[0][0] == "o" and second[0][1] == " "
+    del second
+    gc.collect()
+    assert compiled.journal is None
+    compiled.set_tile(2, 0, "o")
+    assert compiled.journal is None
@@ -0,0 +1,31 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+@pytest.mark.parametrize("start, treasure", [((9, -1), (3, 3)), ((-1, 0), (3, 3)), ((0, 0), (10, 3)),
+                                             ((0, 0), (3, 10)), ((0, 0), (2, 2))])
+def test_nodes_off_the_map_or_blocked_are_rejected(start, treasure):
+    map = [[" "] * 10 for _ in range(10)]
+    map[2][2] = "o"
+    with pytest.raises(ValueError):
+        hunt.solve(map, start, treasure)
+    assert hunt.solve(map, (0, 0), (3, 3)).path[-1] == (3, 3)
+
+
+@pytest.mark.parametrize("options", [{}, {"effect_aware": True}, {"budget": 0.1}, {"epsilon": 1.5},
+                                     {"heuristic": "hex"}, {"clusters": True}])
+def test_a_start_on_the_treasure_costs_nothing(options):
+    map, start, treasures = hunt.game_map()
+    compiled = hunt.CompiledMap(map)
+    if "clusters" in options:
+        options = {"clusters": hunt.ClusterMap(compiled, size=4)}
+    result = hunt.solve(compiled, (4, 1), (4, 1), 1.0, 2.0, 0.5, 1.0, **options)
+    assert result.path == [(4, 1)] and result.cost == 0.0 and result.end == (4, 1)
+    assert result.effects == (1.0, 2.0, 0.5, 1.0) and result.events == []
+    assert result.bound == (1.0 if "budget" in options or "epsilon" in options else None)
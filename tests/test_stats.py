@@ -0,0 +1,26 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+@pytest.mark.parametrize("options", [{}, {"effect_aware": True}, {"budget": 0.5}])
+def test_searches_only_count_for_a_search_stats(options):
+    map, start, treasures = hunt.game_map()
+    compiled = hunt.CompiledMap(map)
+    state = hunt.SearchState(compiled.max_q, compiled.max_r)
+    recorded = []
+    stats = hunt.SearchStats(callback=recorded.append)
+    counted = hunt.solve(compiled, start, treasures[0], state=state, stats=stats, **options)
+    assert len(recorded) == 1 and recorded[0]["popped"] == counted.expanded > 0
+    assert recorded[0]["generated"] > 0 and recorded[0]["pushes"] > 0 and recorded[0]["trace_s"] > 0
+    assert json.loads(stats.to_json()) == stats.as_dict() == recorded[0]
+
+    quiet = hunt.solve(compiled, start, treasures[0], state=state, **options)
+    assert quiet.path == counted.path and quiet.expanded == counted.expanded
+    assert state.generated == state.pushes == state.pushbacks == state.reopened == 0 and state.trace_s == 0.0
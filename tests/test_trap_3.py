@@ -0,0 +1,45 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+
+
+# nodes [q, r] moving from node [q, r] through the neighbour in direction (i, j) lands on
+def landings(compiled, q, r, i, j):
+    n = r * compiled.max_q + q
+    nxt = n + j * compiled.max_q + i
+    for k in range(n * 6, n * 6 + compiled.degree[n]):
+        if compiled.neighbours[k] == nxt:
+            return [(m % compiled.max_q, m // compiled.max_q) for m in compiled.landing[2 * k:2 * k + 2] if m >= 0]
+    return None
+
+
+def test_moves_onto_a_trap_3_land_where_it_pushes_the_player():
+    compiled = hunt.CompiledMap([[" "] * 5 for _ in range(5)])
+    compiled.set_tile(2, 2, "t3")
+    # stepping north onto the trap pushes the player two nodes south, back through the node it came from
+    assert landings(compiled, 2, 3, 0, -1) == [(2, 3), (2, 4)]
+    compiled.set_tile(2, 4, "o")
+    assert landings(compiled, 2, 3, 0, -1) == [(2, 3)]
+    # a search never stands on the trap, moving onto it lands where it pushes
+    compiled.set_tile(2, 4, " ")
+    path = hunt.solve(compiled, (2, 3), (2, 0)).path
+    assert (2, 2) not in path
+
+
+def test_the_landing_table_matches_handle_trap_3():
+    map, start, treasures = hunt.generate_map(8, 20, 20, traps=0.3)
+    compiled = hunt.CompiledMap(map)
+    checked = 0
+    for r in range(compiled.max_r):
+        for q in range(compiled.max_q):
+            if not compiled.is_open(q, r):
+                continue
+            for (i, j) in hunt.DIRECTIONS[q % 2]:
+                if compiled.is_open(q + i, r + j) and compiled.name(q + i, r + j) == "t3":
+                    pushed = hunt.handle_trap_3(q + i, r + j, compiled, i, j)
+                    assert landings(compiled, q, r, i, j) == pushed
+                    checked += 1
+    assert checked > 50
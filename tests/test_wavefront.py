@@ -0,0 +1,23 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+hunt = importlib.import_module("treasure-hunt")
+numpy = pytest.importorskip("numpy")
+
+
+def test_wavefront_fields_match_distance_field():
+    for seed in range(5):
+        map, start, treasures = hunt.generate_map(seed, 30, 24, traps=0.1, rewards=0.1)
+        compiled = hunt.CompiledMap(map)
+        state = hunt.SearchState(compiled.max_q, compiled.max_r)
+        effects = (1.0, 2.0, 0.5, 1.0)
+        field = numpy.array(hunt.distance_field(start, compiled, *effects, state)).reshape(24, 30)
+        wavefront = hunt.wavefront_field(start, compiled, *effects, pushes=hunt.wavefront_pushes(compiled))
+        assert wavefront.shape == (24, 30)
+        reached = numpy.isfinite(field)
+        assert (numpy.isfinite(wavefront) == reached).all()
+        assert numpy.allclose(wavefront[reached], field[reached], rtol=hunt.BENCH_FIELD_ERROR, atol=0.0)
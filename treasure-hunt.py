@@ -1,43 +1,572 @@
+import argparse
+import asyncio
+import collections
+import hashlib
 import heapq
+import itertools
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from array import array
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-# defining the class for each node
-class Node:
-    def __init__(self):
-        # parent node's column index
-        self.parent_q = 0
-        # parent node's row index
-        self.parent_r = 0
-
-        # actual step cost from start node to this node [g(n)]
-        self.step_g = float("inf")
-        # estimated step cost from this node to treasure node [h(n)]
-        self.step_h = 0.0
-        # function of total step cost of this node [f(n) = g(n) + h(n)]
-        self.step_f = float("inf")
-
-        # actual energy cost from start node to this node [g(n)]
-        self.energy_g = float("inf")
-        # estimated energy cost from this node to treasure node [h(n)]
-        self.energy_h = 0.0
-        # function of total energy cost of this node [f(n) = g(n) + h(n)]
-        self.energy_f = float("inf")
+INF = float("inf")
+
+
+# search state shared by every call to a_star_search
+# each attribute is a flat array indexed by r * max_q + q instead of a Node object per cell
+class SearchState:
+    def __init__(self, max_q, max_r):
+        self.max_q = max_q
+        self.max_r = max_r
+        size = max_q * max_r
+
+        # current search, a cell only holds data for this search if its stamp matches
+        self.generation = 0
+        self.stamp = array("L", [0]) * size
+        # closed list (nodes visited), a cell is closed if its closed stamp matches
+        self.closed = array("L", [0]) * size
+
+        # parent node's index
+        self.parent = array("l", [0]) * size
+
+        # actual, estimated and total step cost [g(n), h(n), f(n)]
+        self.step_g = array("d", [INF]) * size
+        self.step_h = array("d", [0.0]) * size
+        self.step_f = array("d", [INF]) * size
+
+        # actual, estimated and total energy cost [g(n), h(n), f(n)]
+        self.energy_g = array("d", [INF]) * size
+        self.energy_h = array("d", [0.0]) * size
+        self.energy_f = array("d", [INF]) * size
 
         # total path cost taking into account both step and energy
-        self.total_g = float("inf")
-        self.total_h = 0.0
-        self.total_f = float("inf")
+        self.total_g = array("d", [INF]) * size
+        self.total_h = array("d", [0.0]) * size
+        self.total_f = array("d", [INF]) * size
+
+        # trap and reward effect
+        self.t1_effect = array("d", [1.0]) * size
+        self.t2_effect = array("d", [1.0]) * size
+        self.r1_effect = array("d", [1.0]) * size
+        self.r2_effect = array("d", [1.0]) * size
+
+        # work done by the searches since reset_counts, nodes expanded are always counted and the rest only while
+        # counting is set, as solve does when a SearchStats records the search
+        self.counting = False
+        self.reset_counts()
+
+    # zero the counters searches add to with tally
+    def reset_counts(self):
+        # nodes expanded, moves generated, labels pushed by searches that keep their own open list, trap 3 push backs
+        # stepped onto and visited nodes updated again
+        self.expanded = 0
+        self.generated = 0
+        self.pushes = 0
+        self.pushbacks = 0
+        self.reopened = 0
+        # seconds spent following the parent nodes back to the start node
+        self.trace_s = 0.0
+
+    # add the work of one search to the counters
+    def tally(self, expanded, generated=0, pushes=0, pushbacks=0, reopened=0, trace_s=0.0):
+        self.expanded += expanded
+        self.generated += generated
+        self.pushes += pushes
+        self.pushbacks += pushbacks
+        self.reopened += reopened
+        self.trace_s += trace_s
+
+    # check if the state can be reused for a map of this size
+    def fits(self, max_q, max_r):
+        return self.max_q == max_q and self.max_r == max_r
+
+    # start a new search by moving to the next generation instead of reallocating
+    def reset(self):
+        self.generation += 1
+        # stamps are unsigned, clear them before they wrap around
+        if self.generation >= 0xFFFFFFFF:
+            size = self.max_q * self.max_r
+            self.stamp = array("L", [0]) * size
+            self.closed = array("L", [0]) * size
+            self.generation = 1
+
+    # index of node n and reset its data the first time it is touched in this search
+    def cell(self, q, r):
+        i = r * self.max_q + q
+        if self.stamp[i] != self.generation:
+            self.stamp[i] = self.generation
+            self.parent[i] = 0
+            self.step_g[i] = INF
+            self.step_h[i] = 0.0
+            self.step_f[i] = INF
+            self.energy_g[i] = INF
+            self.energy_h[i] = 0.0
+            self.energy_f[i] = INF
+            self.total_g[i] = INF
+            self.total_h[i] = 0.0
+            self.total_f[i] = INF
+            self.t1_effect[i] = 1.0
+            self.t2_effect[i] = 1.0
+            self.r1_effect[i] = 1.0
+            self.r2_effect[i] = 1.0
+        return i
+
+    # check if node n has been visited in this search
+    def is_closed(self, q, r):
+        return self.closed[r * self.max_q + q] == self.generation
+
+    # mark node n as visited
+    def close(self, q, r):
+        self.closed[r * self.max_q + q] = self.generation
+
+    # column and row of the parent of node n
+    def parent_of(self, q, r):
+        p = self.parent[self.cell(q, r)]
+        return p % self.max_q, p // self.max_q
+
+
+# search state holding only the nodes a search touches, a dict in place of each flat array
+# for searches kept to a few clusters of a very large map, where SearchState would allocate every node
+class SparseState(SearchState):
+    FIELDS = ("parent", "step_g", "step_h", "step_f", "energy_g", "energy_h", "energy_f", "total_g", "total_h",
+              "total_f", "t1_effect", "t2_effect", "r1_effect", "r2_effect")
+
+    def __init__(self, max_q, max_r):
+        self.max_q = max_q
+        self.max_r = max_r
+        self.generation = 1
+        # nodes not touched yet read as stamp and closed 0, every other field is set by cell
+        self.stamp = collections.defaultdict(int)
+        self.closed = collections.defaultdict(int)
+        for field in self.FIELDS:
+            setattr(self, field, {})
+        self.counting = False
+        self.reset_counts()
+
+    # start a new search by forgetting the nodes the last one touched
+    def reset(self):
+        self.stamp.clear()
+        self.closed.clear()
+        for field in self.FIELDS:
+            getattr(self, field).clear()
+
+
+# integer code for each kind of node
+EMPTY = 0
+PLAYER = 1
+TREASURE = 2
+OBSTACLE = 3
+REWARD_1 = 4
+REWARD_2 = 5
+TRAP_1 = 6
+TRAP_2 = 7
+TRAP_3 = 8
+TRAP_4 = 9
+VISITED = 10
+
+# map characters for each code, indexed by code
+TILE_NAMES = [" ", "p", "g", "o", "r1", "r2", "t1", "t2", "t3", "t4", "x"]
+TILE_CODES = {name: code for code, name in enumerate(TILE_NAMES)}
+VALID_CODES = bytes(range(len(TILE_NAMES)))
+
+# directional movements [N, NE, SE, S, SW, NW] for even and odd q
+DIRECTIONS = (((0, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0)),
+              ((0, -1), (1, -1), (1, 0), (0, 1), (-1, 0), (-1, -1)))
+
+
+# map compiled once into tile codes and a neighbour table for the search
+# the list of strings map is only an input format, the search never compares strings
+class CompiledMap:
+    def __init__(self, map):
+        self.max_r = len(map)
+        self.max_q = len(map[0])
+        # source map kept in sync by set_tile for printing
+        self.map = map
+
+        # one tile code per node, indexed by r * max_q + q
+        self.tiles = bytearray(self.max_q * self.max_r)
+        for r in range(self.max_r):
+            if len(map[r]) != self.max_q:
+                raise ValueError("row " + str(r) + " has " + str(len(map[r])) + " nodes, expected "
+                                 + str(self.max_q))
+            codes = [TILE_CODES.get(name) for name in map[r]]
+            if None in codes:
+                q = codes.index(None)
+                raise ValueError("unknown node " + repr(map[r][q]) + " at (" + str(q) + ", " + str(r) + ")")
+            self.tiles[r * self.max_q:(r + 1) * self.max_q] = bytes(codes)
+        self.build()
+
+    # map of max_q nodes a row from the tile codes of every node, such as the tiles of another CompiledMap or a
+    # loaded map file, without building a list of strings map, map is then a TileRows view of the tiles
+    # trusted takes tiles, a bytearray the caller has checked the codes of and hands over, as the map's own tiles
+    # instead of copying and checking them again
+    @classmethod
+    def from_tiles(cls, tiles, max_q, trusted=False):
+        compiled = cls.__new__(cls)
+        compiled.tiles = tiles if trusted else bytearray(tiles)
+        if max_q < 1 or len(compiled.tiles) % max_q != 0:
+            raise ValueError(str(len(compiled.tiles)) + " nodes do not make rows of " + str(max_q) + " nodes")
+        invalid = b"" if trusted else compiled.tiles.translate(None, VALID_CODES)
+        if len(invalid) > 0:
+            n = compiled.tiles.index(invalid[0])
+            raise ValueError("unknown node code " + str(invalid[0]) + " at (" + str(n % max_q) + ", " +
+                             str(n // max_q) + ")")
+        compiled.max_q = max_q
+        compiled.max_r = len(compiled.tiles) // max_q
+        compiled.map = TileRows(compiled)
+        compiled.build()
+        return compiled
+
+    # build the neighbour table from the tiles and start at version 0
+    def build(self):
+        # neighbour table with six slots per node
+        # the first degree[n] slots of node n hold its neighbours that are inside the map and not obstacles,
+        # in the order [N, NE, SE, S, SW, NW]
+        size = self.max_q * self.max_r
+        self.degree = bytearray(size)
+        self.neighbours = array("i", [-1]) * (size * 6)
+        # where the player lands moving through each neighbour slot, two entries per slot
+        # a plain neighbour is landed on, a trap 3 neighbour pushes the player back up to two nodes and each node
+        # moved through is a landing, -1 marks an unused entry
+        self.landing = array("i", [-1]) * (size * 12)
+        for n in range(size):
+            self.link(n)
+
+        # bumped by every set_tile, digest is kept for the version it was computed at
+        self.version = 0
+        self.digest_of = None
+        self.counts_of = None
+        # set by freeze, see there
+        self.frozen = False
+        # (node, tile code before) of every set_tile since the oldest live snapshot, see MapSnapshot
+        self.journal = None
+        self.journal_from = 0
+        self.snapshots = weakref.WeakSet()
+
+    # check if node n is within the map and not an obstacle
+    def is_open(self, q, r):
+        return (is_valid(q, r, self.max_q, self.max_r)
+                and self.tiles[r * self.max_q + q] != OBSTACLE and self.tiles[r * self.max_q + q] != TRAP_4)
+
+    # fill the neighbour slots of node n and where each of them lands the player
+    def link(self, n):
+        max_q = self.max_q
+        tiles = self.tiles
+        neighbours = self.neighbours
+        landing = self.landing
+        r, q = divmod(n, max_q)
+        k = n * 6
+        for (i, j) in DIRECTIONS[q % 2]:
+            if 0 <= q + i < max_q and 0 <= r + j < self.max_r:
+                nxt = n + j * max_q + i
+                tile = tiles[nxt]
+                if tile == OBSTACLE or tile == TRAP_4:
+                    continue
+                neighbours[k] = nxt
+                if tile == TRAP_3:
+                    landings = [land_r * max_q + land_q for (land_q, land_r) in handle_trap_3(q + i, r + j, self, i, j)]
+                    landings += [-1] * (2 - len(landings))
+                    landing[2 * k] = landings[0]
+                    landing[2 * k + 1] = landings[1]
+                else:
+                    landing[2 * k] = nxt
+                    landing[2 * k + 1] = -1
+                k += 1
+        self.degree[n] = k - n * 6
+        while k < n * 6 + 6:
+            neighbours[k] = -1
+            landing[2 * k] = -1
+            landing[2 * k + 1] = -1
+            k += 1
+
+    # independent copy to simulate moves on without touching this map
+    def copy(self):
+        other = CompiledMap.__new__(CompiledMap)
+        other.max_q = self.max_q
+        other.max_r = self.max_r
+        other.map = TileRows(other) if isinstance(self.map, TileRows) else [row[:] for row in self.map]
+        other.tiles = self.tiles[:]
+        other.degree = self.degree[:]
+        other.neighbours = self.neighbours[:]
+        other.landing = self.landing[:]
+        other.version = self.version
+        other.digest_of = self.digest_of
+        other.counts_of = self.counts_of
+        other.frozen = False
+        other.journal = None
+        other.journal_from = 0
+        other.snapshots = weakref.WeakSet()
+        return other
+
+    # a pickled map, as sent to a worker process, leaves its snapshots and journal behind like a copy does
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["journal"] = None
+        state["journal_from"] = 0
+        del state["snapshots"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.snapshots = weakref.WeakSet()
+
+    # view of the map as it is now that keeps up with later set_tile calls without copying the nodes
+    def snapshot(self):
+        return MapSnapshot(self)
+
+    # drop the journal entries no live snapshot reads, and the journal once no snapshot is left
+    def trim_journal(self):
+        if self.journal is None:
+            return
+        # a snapshot being dropped is no longer listed, even while the set still counts it
+        versions = [snapshot.version for snapshot in self.snapshots]
+        if len(versions) == 0:
+            self.journal = None
+            self.journal_from = 0
+            return
+        oldest = min(versions)
+        del self.journal[:oldest - self.journal_from]
+        self.journal_from = oldest
+
+    # make set_tile raise from now on so searches running at once can share the map, copies are not frozen
+    # returns the map
+    def freeze(self):
+        self.frozen = True
+        return self
+
+    # hash of the map size and nodes, equal maps get the same digest whatever their version
+    def digest(self):
+        if self.digest_of is None or self.digest_of[0] != self.version:
+            content = hashlib.sha1(str(self.max_q).encode() + b":" + bytes(self.tiles))
+            self.digest_of = (self.version, content.hexdigest())
+        return self.digest_of[1]
+
+    # reward_counts of the REWARD_1 and of the REWARD_2 nodes, kept for the version they were counted at
+    def reward_counts(self):
+        if self.counts_of is None or self.counts_of[0] != self.version:
+            self.counts_of = (self.version, reward_counts(self, REWARD_1), reward_counts(self, REWARD_2))
+        return self.counts_of[1], self.counts_of[2]
+
+    # map character of node n
+    def name(self, q, r):
+        return TILE_NAMES[self.tiles[r * self.max_q + q]]
+
+    # change node n and keep the neighbour table and source map up to date
+    def set_tile(self, q, r, name):
+        if self.frozen:
+            raise ValueError("cannot change node (" + str(q) + ", " + str(r) + ") of a frozen map, change a copy")
+        n = r * self.max_q + q
+        was_open = self.is_open(q, r)
+        was_trap_3 = self.tiles[n] == TRAP_3
+        if self.journal is not None:
+            self.journal.append((n, self.tiles[n]))
+        self.tiles[n] = TILE_CODES[name]
+        self.map[r][q] = name
+        self.version += 1
+        # only obstacles and trap 3 change the tables, a push back can end two nodes past a trap 3 so relink every
+        # node up to three away
+        if was_open != self.is_open(q, r) or was_trap_3 != (self.tiles[n] == TRAP_3):
+            for near_r in range(max(r - 3, 0), min(r + 4, self.max_r)):
+                for near_q in range(max(q - 3, 0), min(q + 4, self.max_q)):
+                    self.link(near_r * self.max_q + near_q)
+
+
+# rows of a CompiledMap made from tile codes, standing in for the list of strings map without a string per node
+# map[r][q] reads the map character of a node and setting it changes the node with set_tile
+class TileRows:
+    def __init__(self, compiled):
+        self.compiled = compiled
+
+    def __len__(self):
+        return self.compiled.max_r
+
+    def __getitem__(self, r):
+        if r < 0:
+            r += self.compiled.max_r
+        if not 0 <= r < self.compiled.max_r:
+            raise IndexError("row " + str(r) + " is outside the map")
+        return TileRow(self, r)
+
+    # tile code of node n
+    def code(self, n):
+        return self.compiled.tiles[n]
+
+    def set(self, q, r, name):
+        if self.compiled.tiles[r * self.compiled.max_q + q] != TILE_CODES[name]:
+            self.compiled.set_tile(q, r, name)
+
+
+# row r of a TileRows
+class TileRow:
+    def __init__(self, rows, r):
+        self.rows = rows
+        self.r = r
+
+    def __len__(self):
+        return self.rows.compiled.max_q
+
+    def __getitem__(self, q):
+        max_q = self.rows.compiled.max_q
+        if isinstance(q, slice):
+            return [self[i] for i in range(*q.indices(max_q))]
+        if q < 0:
+            q += max_q
+        if not 0 <= q < max_q:
+            raise IndexError("node " + str(q) + " is outside the row")
+        return TILE_NAMES[self.rows.code(self.r * max_q + q)]
+
+    def __setitem__(self, q, name):
+        self.rows.set(q, self.r, name)
+
+
+# read only view of a CompiledMap as it was when the snapshot was taken, read like a list of strings map
+# nothing is copied, the map journals the tile code each set_tile replaces while a snapshot is alive and the
+# snapshot reads a changed node back from the journal
+# the journal is cut back to the oldest live snapshot whenever a snapshot is dropped
+class MapSnapshot(TileRows):
+    def __init__(self, compiled):
+        super().__init__(compiled)
+        self.version = compiled.version
+        if compiled.journal is None:
+            compiled.journal = []
+            compiled.journal_from = compiled.version
+        compiled.snapshots.add(self)
+        weakref.finalize(self, compiled.trim_journal)
+        # tile code each node changed since the snapshot had, read from the journal up to map version undone_at
+        self.undone = {}
+        self.undone_at = compiled.version
+
+    def code(self, n):
+        compiled = self.compiled
+        if self.undone_at != compiled.version:
+            # only the entries added since the last read are new, an earlier entry for a node keeps its code
+            journal = compiled.journal
+            for i in range(self.undone_at - compiled.journal_from, len(journal)):
+                m, code = journal[i]
+                self.undone.setdefault(m, code)
+            self.undone_at = compiled.version
+        return self.undone.get(n, compiled.tiles[n])
+
+    def set(self, q, r, name):
+        raise ValueError("cannot change node (" + str(q) + ", " + str(r) + ") of a map snapshot")
+
+
+# binary map files start with MAP_MAGIC and the columns and rows of the map as little-endian 32-bit integers,
+# followed by one tile code per node row by row, so the nodes are read straight from the memory-mapped file
+MAP_MAGIC = b"THMAP\x01"
+MAP_HEADER = struct.Struct("<6sII")
+
+# text map files hold one row per line with the nodes separated by spaces, "." for an empty node, and lines
+# starting with "#" are comments
+TEXT_NAMES = ["." if name == " " else name for name in TILE_NAMES]
+TEXT_CODES = {name: code for code, name in enumerate(TEXT_NAMES)}
+
+# nodes a map file loader gives the positions of
+FOUND_CODES = (PLAYER, TREASURE, TRAP_1, TRAP_2, TRAP_3, TRAP_4)
+
+
+# check the tile codes of rows of max_q nodes starting at row r, bytes or a bytearray, and add the positions of their
+# player, treasure and trap nodes to found
+def scan_rows(rows, max_q, r, found):
+    invalid = rows.translate(None, VALID_CODES)
+    if len(invalid) > 0:
+        n = rows.index(invalid[0])
+        raise ValueError("unknown node code " + str(invalid[0]) + " at (" + str(n % max_q) + ", " +
+                         str(r + n // max_q) + ")")
+    for code in FOUND_CODES:
+        n = rows.find(code)
+        while n >= 0:
+            found[code].append((n % max_q, r + n // max_q))
+            n = rows.find(code, n + 1)
+
 
-        # set trap and reward effect
-        self.t1_effect = 1.0
-        self.t2_effect = 1.0
-        self.r1_effect = 1.0
-        self.r2_effect = 1.0
+# load a map file written by save_map, text or binary
+# the rows are checked as they are read and the player, treasure and trap nodes picked out on the way
+# returns the CompiledMap, the start node or None if there is no player node, the treasure nodes and the trap
+# nodes by name, each in row order
+def load_map(path):
+    found = {code: [] for code in FOUND_CODES}
+    with open(path, "rb") as source:
+        if source.read(len(MAP_MAGIC)) == MAP_MAGIC:
+            compiled = load_binary(source, found)
+        else:
+            source.seek(0)
+            compiled = load_text(source, found)
+
+    if len(found[PLAYER]) > 1:
+        raise ValueError("the map has " + str(len(found[PLAYER])) + " player nodes, expected at most one")
+    start = found[PLAYER][0] if len(found[PLAYER]) > 0 else None
+    traps = {TILE_NAMES[code]: found[code] for code in (TRAP_1, TRAP_2, TRAP_3, TRAP_4)}
+    return compiled, start, found[TREASURE], traps
+
+
+# nodes of a binary map file, copied once from the memory-mapped file into the tiles the map keeps
+def load_binary(source, found):
+    with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < MAP_HEADER.size:
+            raise ValueError("the map file ends inside its header")
+        magic, max_q, max_r = MAP_HEADER.unpack_from(mapped)
+        if len(mapped) != MAP_HEADER.size + max_q * max_r:
+            raise ValueError("a " + str(max_q) + "x" + str(max_r) + " map file should hold " + str(max_q * max_r) +
+                             " nodes, it holds " + str(len(mapped) - MAP_HEADER.size))
+        if max_q < 1 or max_r < 1:
+            raise ValueError("the map file has no nodes")
+        with memoryview(mapped) as view, view[MAP_HEADER.size:] as nodes:
+            tiles = bytearray(nodes)
+    scan_rows(tiles, max_q, 0, found)
+    return CompiledMap.from_tiles(tiles, max_q, trusted=True)
 
-        # set nodes to move to
-        # is current node by default
-        # add movement if trigger trap 3
-        self.movement_list = []
+
+# nodes of a text map file, read a line at a time
+def load_text(source, found):
+    tiles = bytearray()
+    max_q = None
+    r = 0
+    for line_no, line in enumerate(source, 1):
+        names = line.split()
+        if len(names) == 0 or names[0].startswith(b"#"):
+            continue
+        try:
+            row = bytes(TEXT_CODES[name.decode()] for name in names)
+        except (KeyError, UnicodeDecodeError) as e:
+            raise ValueError("line " + str(line_no) + ": unknown node " + str(e))
+        if max_q is None:
+            max_q = len(row)
+        elif len(row) != max_q:
+            raise ValueError("line " + str(line_no) + ": row has " + str(len(row)) + " nodes, expected " +
+                             str(max_q))
+        scan_rows(row, max_q, r, found)
+        tiles += row
+        r += 1
+    if max_q is None:
+        raise ValueError("the map file has no rows")
+    return CompiledMap.from_tiles(tiles, max_q, trusted=True)
+
+
+# write compiled to a map file load_map reads, as text or as binary tile codes
+def save_map(compiled, path, binary=False):
+    max_q = compiled.max_q
+    if binary:
+        with open(path, "wb") as target:
+            target.write(MAP_HEADER.pack(MAP_MAGIC, max_q, compiled.max_r))
+            target.write(compiled.tiles)
+    else:
+        with open(path, "w") as target:
+            for r in range(compiled.max_r):
+                target.write(" ".join(TEXT_NAMES[code] for code in compiled.tiles[r * max_q:(r + 1) * max_q]) + "\n")
 
 
 # check if node n is valid (within the boundaries of the map)
@@ -67,32 +596,32 @@ def is_trap(q, r, map):
         return True
 
 
-def handle_reward(new_q, new_r, q, r, map, nodes, r1_effect_new, r2_effect_new):
+def handle_reward(tile, r1_effect_new, r2_effect_new):
     # half energy cost if reward 1
-    if map[new_r][new_q] == "r1":
-        r1_effect_new = nodes[r][q].r1_effect * 0.5
+    if tile == REWARD_1:
+        r1_effect_new = r1_effect_new * 0.5
     # half step cost if reward 2
-    elif map[new_r][new_q] == "r2":
-        r2_effect_new = nodes[r][q].r2_effect * 0.5
+    elif tile == REWARD_2:
+        r2_effect_new = r2_effect_new * 0.5
 
     return r1_effect_new, r2_effect_new
 
 
-def handle_trap_1_2(new_q, new_r, q, r, map, nodes, t1_effect_new, t2_effect_new):
+def handle_trap_1_2(tile, t1_effect_new, t2_effect_new):
     # double energy cost if trap 1
-    if map[new_r][new_q] == "t1":
-        t1_effect_new = nodes[r][q].t1_effect * 2
+    if tile == TRAP_1:
+        t1_effect_new = t1_effect_new * 2
     # double energy cost if trap 2
-    elif map[new_r][new_q] == "t2":
-        t2_effect_new = nodes[r][q].t2_effect * 2
+    elif tile == TRAP_2:
+        t2_effect_new = t2_effect_new * 2
 
     return t1_effect_new, t2_effect_new
 
 
 # push player back 2 nodes if trap 3
-def handle_trap_3(q, r, map, i, j, nodes):
-    # empty movement_list to update
-    nodes[r][q].movement_list = []
+# returns the nodes the player moves through, the last one being where the player lands
+def handle_trap_3(q, r, compiled, i, j):
+    movement_list = []
 
     if q % 2 == 0:
         # push player in the opposite direction [S, SW, NW, N, NE, SE]
@@ -118,11 +647,13 @@ def handle_trap_3(q, r, map, i, j, nodes):
                 temp_q = new_q + d[count][0]
                 temp_r = new_r + d[count][1]
                 # check if node is within map boundaries and not obstacle
-                if is_valid(temp_q, temp_r, len(map[0]), len(map)) and not is_obstacle(temp_q, temp_r, map):
+                if compiled.is_open(temp_q, temp_r):
                     new_q = temp_q
                     new_r = temp_r
                     # insert valid node into movement list
-                    nodes[r][q].movement_list.append((new_q, new_r))
+                    movement_list.append((new_q, new_r))
+
+    return movement_list
 
 
 # check if node n is obstacle
@@ -157,345 +688,3460 @@ def prioritise_treasure(q, r, treasures):
             return tsr
 
 
+# text of a node in a drawn hex cell, four characters wide
+CELLS = {name: (" " + name + " " if len(name) == 2 else "  " + name + " ") for name in TILE_NAMES}
+
+
+# tile names of the nodes q_from to q_to on row r of a list of strings map, a TileRows view or a CompiledMap
+def row_names(map, r, q_from, q_to):
+    if isinstance(map, CompiledMap):
+        start = r * map.max_q
+        return [TILE_NAMES[code] for code in map.tiles[start + q_from:start + q_to]]
+    return map[r][q_from:q_to]
+
+
+# viewport (q_from, r_from, q_to, r_to) around the nodes of a path, margin nodes wide and kept on the map
+def path_viewport(path, max_q, max_r, margin=2):
+    if len(path) == 0:
+        return (0, 0, max_q, max_r)
+    q_from = max(min(q for (q, r) in path) - margin, 0)
+    r_from = max(min(r for (q, r) in path) - margin, 0)
+    q_to = min(max(q for (q, r) in path) + margin + 1, max_q)
+    r_to = min(max(r for (q, r) in path) + margin + 1, max_r)
+    return (q_from, r_from, q_to, r_to)
+
+
+# lines of the hex drawing of a map, one at a time so a large map is never held as a whole
+# the viewport (q_from, r_from, q_to, r_to) draws part of the map, q_from is moved to an even column since
+# odd columns are drawn half a node higher than even ones
+def render_lines(map, viewport=None):
+    if isinstance(map, CompiledMap):
+        max_q, max_r = map.max_q, map.max_r
+    else:
+        max_r = len(map)
+        max_q = len(map[0]) if max_r > 0 else 0
+    q_from, r_from, q_to, r_to = viewport if viewport is not None else (0, 0, max_q, max_r)
+    q_from -= q_from % 2
+    if not (0 <= q_from < q_to <= max_q and 0 <= r_from < r_to <= max_r):
+        raise ValueError("viewport " + str(viewport) + " is outside the " + str(max_q) + "x" + str(max_r) + " map")
+    width = q_to - q_from
+    odd = width // 2
+    even = width - odd
+
+    yield "     " + " ____     " * odd
+    for r in range(r_from, r_to):
+        names = row_names(map, r, q_from, q_to)
+        line = ["\\" if r != r_from else " "]
+        for i in range(1, width, 2):
+            line.append("____/" + CELLS[names[i]] + "\\")
+        if width % 2 == 1:
+            line.append("____/" if r != r_from else "____")
+        yield "".join(line)
+        line = ["/"]
+        for i in range(0, width - 1, 2):
+            line.append(CELLS[names[i]] + "\\____/")
+        if width % 2 == 1:
+            line.append(CELLS[names[width - 1]] + "\\")
+        yield "".join(line)
+    yield "\\____/    " * even
+
+
+# hex drawing of a map as one string
+def render_map(map, viewport=None):
+    return "\n".join(render_lines(map, viewport)) + "\n"
+
+
+# stream the hex drawing of a map to a file row by row
+def write_map(map, file, viewport=None):
+    for line in render_lines(map, viewport):
+        file.write(line)
+        file.write("\n")
+
+
 # print the map and results
-def print_map(map):
-    print("     ", end="")
-    for i in range(0, 5):
-        print(" ____", end="     ")
-    for r in map:
-        if map.index(r) != 0:
-            print("\n\\", end="")
+def print_map(map, viewport=None):
+    sys.stdout.write(render_map(map, viewport))
+
+
+# to draw the path taken to the treasure node at each iteration
+def draw_path(state, tsr):
+    path = trace_path(state, tsr)
+    print_path(path)
+    return path
+
+
+# print path
+def print_path(path):
+    sys.stdout.write("".join("-> " + str(n) + " " for n in path) + "\n")
+
+
+# compact text of a path for logging long routes, the first node as q,r: then one digit per step, the index of
+# its direction in DIRECTIONS, and a step that is not to a neighbour, such as a t3 push, as [q,r] of its node
+def encode_path(path):
+    if len(path) == 0:
+        return ""
+    q, r = path[0]
+    codes = [str(q) + "," + str(r) + ":"]
+    for (next_q, next_r) in path[1:]:
+        step = (next_q - q, next_r - r)
+        if step in DIRECTIONS[q % 2]:
+            codes.append(str(DIRECTIONS[q % 2].index(step)))
         else:
-            print("\n ", end="")
-        for i in range(1, 10, 2):
-            if r[i] == "t1" or r[i] == "t2" or r[i] == "r1" or r[i] == "r2" or r[i] == "t3" or r[i] == "t4":
-                print("____/ " + r[i] + " \\", end="")
-            else:
-                print("____/  " + r[i] + " \\", end="")
-        print("\n/", end="")
+            codes.append("[" + str(next_q) + "," + str(next_r) + "]")
+        q, r = next_q, next_r
+    return "".join(codes)
 
-        for i in range(0, 10, 2):
-            if r[i] == "t1" or r[i] == "t2" or r[i] == "r1" or r[i] == "r2" or r[i] == "t3" or r[i] == "t4":
-                print(" " + r[i] + " \\____/", end="")
+
+# path back from the text of encode_path
+def decode_path(code):
+    if code == "":
+        return []
+    head, _, steps = code.partition(":")
+    try:
+        q, r = (int(v) for v in head.split(","))
+        path = [(q, r)]
+        i = 0
+        while i < len(steps):
+            if steps[i] == "[":
+                end = steps.index("]", i)
+                q, r = (int(v) for v in steps[i + 1:end].split(","))
+                i = end + 1
             else:
-                print("  " + r[i] + " \\____/", end="")
-    print()
-    for i in range(0, 5):
-        print("\\____/", end="    ")
-    print()
+                (i_q, i_r) = DIRECTIONS[q % 2][int(steps[i])]
+                q, r = q + i_q, r + i_r
+                i += 1
+            path.append((q, r))
+    except (ValueError, IndexError):
+        raise ValueError("bad path code " + repr(code))
+    return path
 
 
-# to draw the path taken to the treasure node at each iteration
-def draw_path(nodes, tsr):
+# follow the parent nodes back from the treasure node without printing
+# returns None if the parent nodes loop and never reach the start node
+def trace_path(state, tsr):
     path = []
     r = tsr[1]
     q = tsr[0]
 
-    # draw path from treasure node to the start node
-    while not (nodes[r][q].parent_r == r and nodes[r][q].parent_q == q):
+    # draw path from treasure node to the start node, parent nodes that loop back to a node already drawn have no
+    # start node to reach
+    drawn = set()
+    while state.parent_of(q, r) != (q, r):
         path.append((q, r))
-        temp_r = nodes[r][q].parent_r
-        temp_q = nodes[r][q].parent_q
-        q = temp_q
-        r = temp_r
+        if (q, r) in drawn:
+            return None
+        drawn.add((q, r))
+        q, r = state.parent_of(q, r)
 
     # add start node
     path.append((q, r))
     # reverse to draw path from start node to treasure node
     path.reverse()
 
-    # print path
-    for i in path:
-        print("->", i, end=" ")
-    print()
-
     return path
 
 
+# energy consumed and steps taken along path starting with the given trap and reward effects, and the effects at
+# each of its nodes, by the rules of the searches: a move costs the effects of the node it starts from and takes on
+# the effects of the neighbour moved to, a trap 3 pushes the player back in the same move
+# a search keeps one cost per node, so the path traced from the parent nodes can cost more or less than the cost
+# stored at the treasure node, this is what it costs
+# raises ValueError if a node of path cannot be reached from the one before it
+def walk_path(path, compiled, t1_effect, t2_effect, r1_effect, r2_effect):
+    max_q = compiled.max_q
+    energy = 0.0
+    steps = 0.0
+    effects = [(t1_effect, t2_effect, r1_effect, r2_effect)]
+    for i in range(1, len(path)):
+        cur = path[i - 1][1] * max_q + path[i - 1][0]
+        n = path[i][1] * max_q + path[i][0]
+        energy += t1_effect * r1_effect
+        steps += t2_effect * r2_effect
+        # a node can be landed on by moving to it or by a trap 3 push back, the way leaving the smallest multipliers
+        # is taken as the searches keep the cheaper one, moving onto a reward beats a push and a push beats a trap
+        landed = None
+        for k in range(cur * 6, cur * 6 + compiled.degree[cur]):
+            if compiled.landing[2 * k] == n or compiled.landing[2 * k + 1] == n:
+                tile = compiled.tiles[compiled.neighbours[k]]
+                r1_new, r2_new = handle_reward(tile, r1_effect, r2_effect)
+                t1_new, t2_new = handle_trap_1_2(tile, t1_effect, t2_effect)
+                if landed is None or t1_new * r1_new + t2_new * r2_new < landed[0] * landed[2] + landed[1] * landed[3]:
+                    landed = (t1_new, t2_new, r1_new, r2_new)
+        if landed is None:
+            raise ValueError("node " + str(tuple(path[i])) + " cannot be reached from " + str(tuple(path[i - 1])))
+        t1_effect, t2_effect, r1_effect, r2_effect = landed
+        effects.append(landed)
+    return energy, steps, effects
+
+
 # update energy consumed
-def update_energy(nodes, new_q, new_r, energy_g_new, energy_h_new, energy_f_new):
-    nodes[new_r][new_q].energy_g = energy_g_new
-    nodes[new_r][new_q].energy_h = energy_h_new
-    nodes[new_r][new_q].energy_f = energy_f_new
+def update_energy(state, new_q, new_r, energy_g_new, energy_h_new, energy_f_new):
+    i = state.cell(new_q, new_r)
+    state.energy_g[i] = energy_g_new
+    state.energy_h[i] = energy_h_new
+    state.energy_f[i] = energy_f_new
 
 
 # update steps used
-def update_step(nodes, new_q, new_r, step_g_new, step_h_new, step_f_new):
-    nodes[new_r][new_q].step_g = step_g_new
-    nodes[new_r][new_q].step_h = step_h_new
-    nodes[new_r][new_q].step_f = step_f_new
+def update_step(state, new_q, new_r, step_g_new, step_h_new, step_f_new):
+    i = state.cell(new_q, new_r)
+    state.step_g[i] = step_g_new
+    state.step_h[i] = step_h_new
+    state.step_f[i] = step_f_new
 
 
 # update total path cost
-def update_total(nodes, new_q, new_r, total_g_new, total_h_new, total_f_new):
-    nodes[new_r][new_q].total_g = total_g_new
-    nodes[new_r][new_q].total_h = total_h_new
-    nodes[new_r][new_q].total_f = total_f_new
+def update_total(state, new_q, new_r, total_g_new, total_h_new, total_f_new):
+    i = state.cell(new_q, new_r)
+    state.total_g[i] = total_g_new
+    state.total_h[i] = total_h_new
+    state.total_f[i] = total_f_new
 
 
 # update parent node
-def update_parent(nodes, new_q, new_r, q, r):
-    nodes[new_r][new_q].parent_q = q
-    nodes[new_r][new_q].parent_r = r
+def update_parent(state, new_q, new_r, q, r):
+    state.parent[state.cell(new_q, new_r)] = r * state.max_q + q
 
 
 # set trap and reward effect
-def update_t_r_effect(nodes, new_q, new_r, r1_effect_new, r2_effect_new, t1_effect_new, t2_effect_new):
-    nodes[new_r][new_q].r1_effect = r1_effect_new
-    nodes[new_r][new_q].r2_effect = r2_effect_new
-    nodes[new_r][new_q].t1_effect = t1_effect_new
-    nodes[new_r][new_q].t2_effect = t2_effect_new
+def update_t_r_effect(state, new_q, new_r, r1_effect_new, r2_effect_new, t1_effect_new, t2_effect_new):
+    i = state.cell(new_q, new_r)
+    state.r1_effect[i] = r1_effect_new
+    state.r2_effect[i] = r2_effect_new
+    state.t1_effect[i] = t1_effect_new
+    state.t2_effect[i] = t2_effect_new
 
 
 # update map and player status after each iteration
-def status_update(result_path, map, nodes):
+def status_update(result_path, compiled, state):
     # notify when trigger any trap or reward
+    reporter = PrintReporter()
+    for event in path_events(result_path, compiled, state):
+        reporter.on_event(event)
+
+    # edit map based on path
+    mark_path(result_path, compiled)
+
+
+# traps triggered and rewards obtained along the path, as (node character, q, r, (t1, t2, r1, r2) effects at node)
+# a node only triggers the first time the path reaches it, as it is marked visited afterwards
+# effects at each node are read from state unless given, as walk_path returns them
+def path_events(result_path, compiled, state, effects=None):
+    events = []
+    seen = set()
+    for i, (q, r) in enumerate(result_path):
+        if (q, r) in seen:
+            continue
+        seen.add((q, r))
+        tile = compiled.tiles[r * compiled.max_q + q]
+        if tile in (TRAP_1, TRAP_2, TRAP_3, REWARD_1, REWARD_2):
+            if effects is not None:
+                events.append((TILE_NAMES[tile], q, r, effects[i]))
+                continue
+            n = state.cell(q, r)
+            events.append((TILE_NAMES[tile], q, r, (state.t1_effect[n], state.t2_effect[n], state.r1_effect[n],
+                                                    state.r2_effect[n])))
+    return events
+
+
+# edit map based on path without notifying, used when simulating a tour
+def mark_path(result_path, compiled):
     for (q, r) in result_path:
-        if is_trap(q, r, map):
-            if map[r][q] == "t1":
-                print("Trap 1 triggered at node (" + str(q) + ", " + str(r) +
-                      ")! Energy required per step is doubled! :c")
-                print("Energy multiplier is now " + str(nodes[r][q].r1_effect) + ".")
-            elif map[r][q] == "t2":
-                print("Trap 2 triggered at node (" + str(q) + ", " + str(r) +
-                      ")! Step required per movement is doubled! :c")
-                print("Step multiplier is now " + str(nodes[r][q].r1_effect) + ".")
-            elif map[r][q] == "t3":
-                print("Trap 3 triggered at node (" + str(q) + ", " + str(r) +
-                      ")! Pushed back two nodes. :c")
-
-        if is_reward(q, r, map):
-            if map[r][q] == "r1":
-                print("Reward 1 obtained at node (" + str(q) + ", " + str(r) +
-                      ")! Energy required per step is halved! :D")
-                print("Energy multiplier is now " + str(nodes[r][q].r1_effect) + ".")
-            elif map[r][q] == "r2":
-                print("Reward 2 obtained at node (" + str(q) + ", " + str(r) +
-                      ")! Step required per movement is halved! :D")
-                print("Step multiplier is now " + str(nodes[r][q].r1_effect) + ".")
-
-        # edit map based on path
         if (q, r) == result_path[-1]:
-            map[r][q] = "p"
+            compiled.set_tile(q, r, "p")
+        else:
+            compiled.set_tile(q, r, "x")
+
+
+# open list kept as a plain heapq list with one entry per push
+# an improved node leaves its old entry behind, those stale entries are skipped when popped instead of expanded
+# counting off leaves the counters at 0 for searches nobody reads them from
+class HeapQueue:
+    def __init__(self, counting=True):
+        self.heap = []
+        # key of the live entry of each node in the open list
+        self.key = {}
+        self.counting = counting
+        self.pushes = 0
+        self.pops = 0
+        self.stale = 0
+        self.decrease_keys = 0
+
+    def __len__(self):
+        return len(self.key)
+
+    # empty the open list for the next search, the counters keep adding up
+    def clear(self):
+        self.heap = []
+        self.key = {}
+
+    # add node n, or lower its key if it is already in the open list
+    def push(self, n, key):
+        if self.counting:
+            if n in self.key:
+                self.decrease_keys += 1
+            self.pushes += 1
+        self.key[n] = key
+        heapq.heappush(self.heap, (key, n))
+
+    # remove and return the node with the smallest key, or None if the open list is empty
+    def pop(self):
+        while len(self.heap) > 0:
+            key, n = heapq.heappop(self.heap)
+            if self.key.get(n) == key:
+                del self.key[n]
+                if self.counting:
+                    self.pops += 1
+                return n
+            if self.counting:
+                self.stale += 1
+        return None
+
+    # how much work the open list did and how many stale expansions it avoided
+    def stats(self):
+        return {"pushes": self.pushes, "pops": self.pops, "stale_skipped": self.stale,
+                "decrease_keys": self.decrease_keys}
+
+
+# binary heap that knows where each node sits, so an improved node has its key lowered in place
+# instead of leaving a stale entry behind
+class IndexedHeap:
+    def __init__(self, counting=True):
+        self.heap = []
+        self.keys = []
+        # position of each node in heap
+        self.pos = {}
+        self.counting = counting
+        self.pushes = 0
+        self.pops = 0
+        self.stale = 0
+        self.decrease_keys = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def clear(self):
+        self.heap = []
+        self.keys = []
+        self.pos = {}
+
+    def push(self, n, key):
+        i = self.pos.get(n)
+        if i is None:
+            self.heap.append(n)
+            self.keys.append(key)
+            i = len(self.heap) - 1
+            self.pos[n] = i
+            if self.counting:
+                self.pushes += 1
+        elif key < self.keys[i]:
+            self.keys[i] = key
+            if self.counting:
+                self.decrease_keys += 1
+        else:
+            return
+        self.sift_up(i)
+
+    def pop(self):
+        if len(self.heap) == 0:
+            return None
+        n = self.heap[0]
+        del self.pos[n]
+        last = self.heap.pop()
+        last_key = self.keys.pop()
+        if len(self.heap) > 0:
+            self.heap[0] = last
+            self.keys[0] = last_key
+            self.pos[last] = 0
+            self.sift_down(0)
+        if self.counting:
+            self.pops += 1
+        return n
+
+    # move the entry at i up until its parent is smaller
+    def sift_up(self, i):
+        heap = self.heap
+        keys = self.keys
+        n = heap[i]
+        key = keys[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if keys[parent] <= key:
+                break
+            heap[i] = heap[parent]
+            keys[i] = keys[parent]
+            self.pos[heap[i]] = i
+            i = parent
+        heap[i] = n
+        keys[i] = key
+        self.pos[n] = i
+
+    # move the entry at i down until both children are larger
+    def sift_down(self, i):
+        heap = self.heap
+        keys = self.keys
+        size = len(heap)
+        n = heap[i]
+        key = keys[i]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and keys[child + 1] < keys[child]:
+                child += 1
+            if key <= keys[child]:
+                break
+            heap[i] = heap[child]
+            keys[i] = keys[child]
+            self.pos[heap[i]] = i
+            i = child
+        heap[i] = n
+        keys[i] = key
+        self.pos[n] = i
+
+    # every decrease-key is a stale entry the plain heap would have left behind
+    def stats(self):
+        return {"pushes": self.pushes, "pops": self.pops, "stale_skipped": self.stale,
+                "decrease_keys": self.decrease_keys}
+
+
+# open list engines a_star_search can be asked for by name
+# heap is the default and the quickest, indexed keeps one entry per node but its sifting runs in Python
+OPEN_LISTS = {"heap": HeapQueue, "indexed": IndexedHeap}
+
+
+# open list for a search, queue is an engine name or an open list to reuse and read the counters of
+# an engine made from its name only counts if counting is set
+def open_list_for(queue, counting=True):
+    if isinstance(queue, str):
+        if queue not in OPEN_LISTS:
+            raise ValueError("unknown open list " + repr(queue) + ", expected one of " + ", ".join(OPEN_LISTS))
+        return OPEN_LISTS[queue](counting)
+    queue.clear()
+    return queue
+
+
+# hex distance between nodes [a_q, a_r] and [b_q, b_r] in cube coordinates, odd q columns sit half a node higher
+def hex_distance(a_q, a_r, b_q, b_r):
+    d_q = a_q - b_q
+    d_z = (a_r - (a_q + (a_q & 1)) // 2) - (b_r - (b_q + (b_q & 1)) // 2)
+    return max(abs(d_q), abs(d_z), abs(d_q + d_z))
+
+
+# most hex distance a single move can cover, 1 unless a trap 3 pushes the player further
+def push_reach(compiled):
+    max_q = compiled.max_q
+    reach = 1
+    t = compiled.tiles.find(TRAP_3)
+    while t >= 0:
+        # look at the moves of the nodes next to the trap 3 that step onto it
+        t_r, t_q = divmod(t, max_q)
+        for (i, j) in DIRECTIONS[t_q % 2]:
+            if not is_valid(t_q + i, t_r + j, max_q, compiled.max_r):
+                continue
+            u = t + j * max_q + i
+            for k in range(u * 6, u * 6 + compiled.degree[u]):
+                if compiled.neighbours[k] != t:
+                    continue
+                for n in compiled.landing[2 * k:2 * k + 2]:
+                    if n >= 0:
+                        reach = max(reach, hex_distance(u % max_q, u // max_q, n % max_q, n // max_q))
+        t = compiled.tiles.find(TRAP_3, t + 1)
+    return reach
+
+
+# estimates the energy and steps left from a node to the treasure node for find_path
+# prepare is called once at the start of each search, estimate for each node reached with the effects it has there
+# admissible is set by heuristics that never overestimate, which anytime_paths can take its bound from
+class Heuristic:
+    name = None
+    admissible = False
+
+    def prepare(self, compiled, closest_tsr):
+        pass
+
+    def estimate(self, q, r, t1_effect, t2_effect, r1_effect, r2_effect):
+        raise NotImplementedError
+
+
+# Euclidean distance to the treasure node times the current trap and reward effects, as the game always did
+# it can overestimate as a reward on the way makes the rest of the path cheaper
+class EuclideanHeuristic(Heuristic):
+    name = "euclidean"
+
+    def prepare(self, compiled, closest_tsr):
+        self.tsr = closest_tsr
+
+    def estimate(self, q, r, t1_effect, t2_effect, r1_effect, r2_effect):
+        energy_h, step_h = calc_h(q, r, self.tsr)
+        # include any trap or reward affect that may affect the path
+        return energy_h * r1_effect * t1_effect, step_h * r2_effect * t2_effect
+
+
+# total of the multipliers over moves moves when each move can halve them once, with rewards rewards on the map
+# move i costs at least 0.5 ** min(i, rewards) of the first one as at most one reward is picked up per move
+def discounted_moves(moves, rewards):
+    if moves <= rewards:
+        return 2.0 * (1.0 - 0.5 ** moves)
+    return 2.0 * (1.0 - 0.5 ** rewards) + (moves - rewards) * 0.5 ** rewards
+
+
+# how many nodes of tile there are above and left of every node, counts[r * (max_q + 1) + q] for the nodes in rows
+# before r and columns before q
+def reward_counts(compiled, tile):
+    max_q = compiled.max_q
+    counts = array("l", [0]) * ((max_q + 1) * (compiled.max_r + 1))
+    for r in range(compiled.max_r):
+        row = 0
+        for q in range(max_q):
+            row += compiled.tiles[r * max_q + q] == tile
+            counts[(r + 1) * (max_q + 1) + q + 1] = counts[r * (max_q + 1) + q + 1] + row
+    return counts
+
+
+# how many of the nodes counted in counts are at most near hex distance from node [q, r], or a few more as the
+# count is over the rectangle around them
+def box_count(counts, compiled, q, r, near):
+    width = compiled.max_q + 1
+    q_from = max(q - near, 0)
+    q_to = min(q + near + 1, compiled.max_q)
+    r_from = max(r - near - 1, 0)
+    r_to = min(r + near + 2, compiled.max_r)
+    return (counts[r_to * width + q_to] - counts[r_from * width + q_to] - counts[r_to * width + q_from]
+            + counts[r_from * width + q_from])
+
+
+# total of the multipliers over the first moves moves from node [q, r], as discounted_moves but only counting the
+# rewards in counts the moves can reach, as the rewards picked up in the first i moves lie within i * reach hex
+# distance of the node
+# once the moves can halve the multipliers more than DISCOUNT_LIMIT times the rest is left out, which only makes
+# the total smaller
+def local_discount(counts, compiled, q, r, moves, reach):
+    everywhere = counts[-1]
+    total = 0.0
+    for i in range(moves):
+        near = box_count(counts, compiled, q, r, i * reach)
+        if near == everywhere:
+            # every reward is in reach from here on
+            return total + discounted_moves(moves, everywhere) - discounted_moves(i, everywhere)
+        rewards = min(i, near)
+        if rewards > DISCOUNT_LIMIT:
+            break
+        total += 0.5 ** rewards
+    return total
+
+
+# multipliers halved this many times leave moves too cheap to count next to the first one
+DISCOUNT_LIMIT = 53
+
+
+# fewest moves to the treasure node by hex distance, each costing the cheapest it can get by then
+# traps only make moves dearer and a reward halves its multiplier once, for the move after the one picking it up,
+# and only the rewards near enough to the node are counted, see local_discount, so it never overestimates
+# it is weaker than the Euclidean default away from the treasure node on maps with many rewards, as a path can pick
+# up one after another there, and as it never overestimates find_path expands more nodes with it than with the
+# Euclidean default, which heads straight for the treasure node, it pays off where a bound is needed such as
+# anytime_paths and label_search
+class HexHeuristic(Heuristic):
+    name = "hex"
+    admissible = True
+
+    def prepare(self, compiled, closest_tsr):
+        self.tsr = closest_tsr
+        self.compiled = compiled
+        self.max_q = compiled.max_q
+        self.reach = push_reach(compiled)
+        self.energy_counts, self.step_counts = compiled.reward_counts()
+        # energy and steps of the moves left from each node estimated so far at multipliers of 1.0
+        self.units = {}
+
+    # fewest moves from node [q, r] to the treasure node
+    def moves(self, q, r):
+        return -(-hex_distance(q, r, self.tsr[0], self.tsr[1]) // self.reach)
+
+    def estimate(self, q, r, t1_effect, t2_effect, r1_effect, r2_effect):
+        unit = self.units.get(r * self.max_q + q)
+        if unit is None:
+            moves = self.moves(q, r)
+            unit = (local_discount(self.energy_counts, self.compiled, q, r, moves, self.reach),
+                    local_discount(self.step_counts, self.compiled, q, r, moves, self.reach))
+            self.units[r * self.max_q + q] = unit
+        return unit[0] * t1_effect * r1_effect, unit[1] * t2_effect * r2_effect
+
+
+# landmarks picked by a LandmarkHeuristic unless told otherwise
+LANDMARKS = 8
+
+
+# hex heuristic tightened with landmarks (ALT), the fewest moves to the treasure node is at least the difference of
+# the fewest moves from or to a landmark by the triangle inequality, and each move is discounted as by the hex one
+# the landmarks make up for obstacles in the way, on open maps it is no tighter than the hex heuristic and costs
+# the landmark lookups on top
+# the move counts to and from each landmark are computed once per map layout, reuse the same instance between
+# searches to keep them
+class LandmarkHeuristic(HexHeuristic):
+    name = "alt"
+
+    def __init__(self, count=LANDMARKS):
+        self.count = count
+        self.compiled = None
+        self.version = -1
+        self.digest = None
+        # landmark nodes and the fewest moves from and to each of them for every node, -1 if there is no way
+        self.landmarks = []
+        self.forward = []
+        self.backward = []
+
+    # fewest moves from source to every node, following moves backwards if backward is set
+    def hops(self, compiled, source, backward=False):
+        seen = array("i", [-1]) * (compiled.max_q * compiled.max_r)
+        seen[source] = 0
+        frontier = collections.deque([source])
+        while len(frontier) > 0:
+            u = frontier.popleft()
+            if backward:
+                moves = self.into[self.start[u]:self.start[u + 1]]
+            else:
+                moves = compiled.landing[u * 12:u * 12 + 2 * compiled.degree[u]]
+            for n in moves:
+                if n >= 0 and seen[n] < 0:
+                    seen[n] = seen[u] + 1
+                    frontier.append(n)
+        return seen
+
+    # pick the landmarks far apart from each other and count the moves to and from them
+    def build(self, compiled):
+        size = compiled.max_q * compiled.max_r
+        # nodes moving into each node, into[start[n]:start[n + 1]] for node n
+        self.start = array("l", [0]) * (size + 1)
+        for n in compiled.landing:
+            if n >= 0:
+                self.start[n + 1] += 1
+        for n in range(size):
+            self.start[n + 1] += self.start[n]
+        self.into = array("l", [0]) * self.start[size]
+        filled = self.start[:size]
+        for m in range(len(compiled.landing)):
+            n = compiled.landing[m]
+            if n >= 0:
+                self.into[filled[n]] = m // 12
+                filled[n] += 1
+
+        self.landmarks = []
+        self.forward = []
+        self.backward = []
+        open_nodes = [n for n in range(size) if compiled.tiles[n] != OBSTACLE and compiled.tiles[n] != TRAP_4]
+        if len(open_nodes) == 0:
+            return
+        # the first landmark is the node farthest from any open node, each next one the node farthest from
+        # the landmarks so far, where no way counts as farthest
+        nearest = self.hops(compiled, open_nodes[0])
+        for _ in range(min(self.count, len(open_nodes))):
+            landmark = max(open_nodes, key=lambda n: size if nearest[n] < 0 else nearest[n])
+            if landmark in self.landmarks:
+                break
+            self.landmarks.append(landmark)
+            self.forward.append(self.hops(compiled, landmark))
+            self.backward.append(self.hops(compiled, landmark, backward=True))
+            if len(self.landmarks) == 1:
+                nearest = self.forward[0][:]
+            else:
+                for n in open_nodes:
+                    hops = self.forward[-1][n]
+                    if hops >= 0 and (nearest[n] < 0 or hops < nearest[n]):
+                        nearest[n] = hops
+
+    # count the moves again if compiled is another map or its layout changed
+    def use(self, compiled):
+        if compiled is self.compiled and compiled.version == self.version:
+            return
+        digest = layout_of(compiled)[1]
+        if self.compiled is None or (compiled.max_q, compiled.max_r) != (self.compiled.max_q, self.compiled.max_r) \
+                or digest != self.digest:
+            self.build(compiled)
+        self.compiled = compiled
+        self.version = compiled.version
+        self.digest = digest
+
+    def prepare(self, compiled, closest_tsr):
+        self.use(compiled)
+        HexHeuristic.prepare(self, compiled, closest_tsr)
+        target = closest_tsr[1] * compiled.max_q + closest_tsr[0]
+        self.at_target = [(forward, forward[target], backward, backward[target])
+                          for (forward, backward) in zip(self.forward, self.backward)]
+
+    def moves(self, q, r):
+        n = r * self.max_q + q
+        moves = HexHeuristic.moves(self, q, r)
+        for (forward, forward_target, backward, backward_target) in self.at_target:
+            if forward_target >= 0 and forward[n] >= 0 and forward_target - forward[n] > moves:
+                moves = forward_target - forward[n]
+            if backward_target >= 0 and backward[n] >= 0 and backward[n] - backward_target > moves:
+                moves = backward[n] - backward_target
+        return moves
+
+
+HEURISTICS = {"euclidean": EuclideanHeuristic, "hex": HexHeuristic, "alt": LandmarkHeuristic}
+
+
+# heuristic for a search, heuristic is a name from HEURISTICS or a Heuristic to reuse
+def heuristic_for(heuristic):
+    if isinstance(heuristic, str):
+        if heuristic not in HEURISTICS:
+            raise ValueError("unknown heuristic " + repr(heuristic) + ", expected one of " + ", ".join(HEURISTICS))
+        return HEURISTICS[heuristic]()
+    return heuristic
+
+
+# result of a search for one treasure node
+class SearchResult:
+    def __init__(self, path, energy, steps, end, t1_effect, t2_effect, r1_effect, r2_effect, events, expanded=0,
+                 bound=None):
+        # nodes [q, r] from the start node to the treasure node
+        self.path = path
+        # energy consumed and steps taken
+        self.energy = energy
+        self.steps = steps
+        # new player position
+        self.end = end
+        # trap and reward effects to be carried onto the next search
+        self.t1_effect = t1_effect
+        self.t2_effect = t2_effect
+        self.r1_effect = r1_effect
+        self.r2_effect = r2_effect
+        # traps triggered and rewards obtained, see path_events
+        self.events = events
+        # nodes the search expanded to find the path
+        self.expanded = expanded
+        # how many times the cheapest cost the path costs at most, None unless found by an anytime search
+        self.bound = bound
+
+    # total path cost
+    @property
+    def cost(self):
+        return self.energy + self.steps
+
+    # trap and reward effects in the order the searches take them
+    @property
+    def effects(self):
+        return self.t1_effect, self.t2_effect, self.r1_effect, self.r2_effect
+
+    # the tuple a_star_search returns
+    def as_tuple(self):
+        return (self.path, self.energy, self.steps, self.end, self.t1_effect, self.t2_effect, self.r1_effect,
+                self.r2_effect)
+
+
+# receives what happens during solve, every method does nothing so a reporter only overrides what it needs
+class Reporter:
+    # treasure node reached
+    def on_found(self, result):
+        pass
+
+    # trap triggered or reward obtained, see path_events
+    def on_event(self, event):
+        pass
+
+    # map after the path is marked on it
+    def on_map(self, compiled):
+        pass
+
+    # search finished with this result
+    def on_done(self, result):
+        pass
+
+    # an anytime search found a cheaper path or tightened its bound, given in result.bound
+    def on_improved(self, result):
+        pass
+
+
+# reporter that prints to the terminal like the game always has
+class PrintReporter(Reporter):
+    def on_found(self, result):
+        print("Treasure found!")
+        print_path(result.path)
+
+    def on_event(self, event):
+        name, q, r, (t1_effect, t2_effect, r1_effect, r2_effect) = event
+        if name == "t1":
+            print("Trap 1 triggered at node (" + str(q) + ", " + str(r) +
+                  ")! Energy required per step is doubled! :c")
+            print("Energy multiplier is now " + str(r1_effect) + ".")
+        elif name == "t2":
+            print("Trap 2 triggered at node (" + str(q) + ", " + str(r) +
+                  ")! Step required per movement is doubled! :c")
+            print("Step multiplier is now " + str(r1_effect) + ".")
+        elif name == "t3":
+            print("Trap 3 triggered at node (" + str(q) + ", " + str(r) +
+                  ")! Pushed back two nodes. :c")
+        elif name == "r1":
+            print("Reward 1 obtained at node (" + str(q) + ", " + str(r) +
+                  ")! Energy required per step is halved! :D")
+            print("Energy multiplier is now " + str(r1_effect) + ".")
+        elif name == "r2":
+            print("Reward 2 obtained at node (" + str(q) + ", " + str(r) +
+                  ")! Step required per movement is halved! :D")
+            print("Step multiplier is now " + str(r1_effect) + ".")
+
+    def on_map(self, compiled):
+        print_map(compiled.map)
+
+    def on_done(self, result):
+        print("Energy consumed:", result.energy)
+        print("Steps taken:", result.steps)
+        print("Path cost:", result.energy + result.steps)
+
+    def on_improved(self, result):
+        print("Path with cost " + str(result.cost) + " found, at most " + str(round(result.bound, 3)) +
+              " times the cheapest.")
+
+
+# DEFAULT_CACHE_SIZE results are kept by a PathCache unless told otherwise
+DEFAULT_CACHE_SIZE = 1024
+
+# marks a key that is not in a PathCache, as None is cached for unreachable treasure nodes
+NOT_CACHED = object()
+
+
+# results of solve kept by map digest, start, treasure node, effects and search, least recently used dropped first
+# the digest changes with every set_tile, so a path found before the map changed is never returned after it
+# results are shared between hits, do not change them
+class PathCache:
+    def __init__(self, size=DEFAULT_CACHE_SIZE):
+        if size < 1:
+            raise ValueError("cache size must be at least 1, got " + str(size))
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # key of a query on compiled map, search tells apart searches that can find different paths
+    def key(self, compiled, start, closest_tsr, t1_effect, t2_effect, r1_effect, r2_effect,
+            search=("a_star", "euclidean")):
+        return (compiled.digest(), tuple(start), tuple(closest_tsr), t1_effect, t2_effect, r1_effect, r2_effect,
+                search)
+
+    # cached result for key, or default if it is not cached
+    def get(self, key, default=NOT_CACHED):
+        result = self.entries.get(key, NOT_CACHED)
+        if result is NOT_CACHED:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    # cache result for key, dropping the least recently used result when full
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    # drop every result, the counters keep adding up
+    def clear(self):
+        self.entries.clear()
+
+    # how often the cache saved a search
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries)}
+
+
+# counters and timings of the searches solve runs, added up over every search they are passed to
+# callback, if given, is called with the dict of each search as it finishes, to aggregate it elsewhere
+# searches are only measured when given a SearchStats
+class SearchStats:
+    FIELDS = ("searches", "cache_hits", "popped", "generated", "pushes", "stale_skipped", "decrease_keys",
+              "pushbacks", "reopened", "search_s", "trace_s", "render_s")
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.totals = dict.fromkeys(self.FIELDS, 0)
+
+    # add the counts of one search, or the as_dict of another SearchStats
+    def add(self, counts):
+        for key, value in counts.items():
+            self.totals[key] += value
+
+    # add the counts of one search and pass them to the callback
+    def record(self, counts):
+        self.add(counts)
+        if self.callback is not None:
+            self.callback(counts)
+
+    def as_dict(self):
+        return dict(self.totals)
+
+    def to_json(self):
+        return json.dumps(self.totals)
+
+
+# find the path to the treasure node and return a SearchResult, or None if it cannot be reached
+# a start on the treasure node gives the path of just that node at no cost, whichever search is asked for
+# raises ValueError if start or the treasure node is off the map or on an obstacle
+# nothing is printed and map is left unchanged unless a reporter is given or apply is set
+# apply marks the path on map like the game does after each treasure, map must then be a CompiledMap
+# or a list of strings map the caller wants edited
+# pass a PathCache to reuse the result of an earlier query on the same map, state is not updated on a hit
+# pass a ClusterMap built for map to search its abstract graph first and only look at the clusters it goes through
+# heuristic is a name from HEURISTICS or a Heuristic, used by every search except effect aware ones
+# stats is a SearchStats to record what the search did and how long it and the reporter took
+# budget in seconds or epsilon runs anytime_paths instead, improving the path until budget runs out or it costs at
+# most epsilon times the cheapest, each better path is passed to reporter.on_improved and the last one is returned
+# with its bound, an admissible heuristic gives the bound and any other one guides the search with "hex" bounding it
+# an effect aware search takes budget too, returning the cheapest path it found so far when budget runs out
+def solve(map, start, closest_tsr, t1_effect=1.0, t2_effect=1.0, r1_effect=1.0, r2_effect=1.0, state=None,
+          effect_aware=False, queue="heap", reporter=None, apply=False, cache=None, clusters=None,
+          heuristic="euclidean", stats=None, budget=None, epsilon=None):
+    compiled = map if isinstance(map, CompiledMap) else CompiledMap(map)
+    # a node off the map would wrap around to the other side of it in the flat tables
+    for what, node in (("start", start), ("treasure", closest_tsr)):
+        if not compiled.is_open(*node):
+            raise ValueError(what + " " + str(list(node)) + " is off the map or blocked")
+    if effect_aware and clusters is not None:
+        raise ValueError("effect aware searches cannot use a cluster map")
+    if effect_aware and epsilon is not None:
+        raise ValueError("effect aware searches find the cheapest path, they cannot take epsilon")
+    anytime = not effect_aware and (budget is not None or epsilon is not None)
+    if anytime and clusters is not None:
+        raise ValueError("anytime searches cannot use a cluster map")
+
+    result = NOT_CACHED
+    if cache is not None:
+        name = heuristic if isinstance(heuristic, str) else heuristic.name
+        if effect_aware:
+            search = "label" if budget is None else ("label", budget)
+        elif clusters is not None:
+            search = ("hierarchical", clusters.size, name)
+        elif anytime:
+            search = ("anytime", name, budget, epsilon)
+        else:
+            search = ("a_star", name)
+        key = cache.key(compiled, start, closest_tsr, t1_effect, t2_effect, r1_effect, r2_effect, search)
+        result = cache.get(key)
+
+    counts = None
+    if stats is not None:
+        counts = dict.fromkeys(SearchStats.FIELDS, 0)
+
+    if result is NOT_CACHED:
+        # reuse the search state if it fits the map, otherwise allocate one, holding only the nodes touched when
+        # the search keeps to the clusters on the way
+        if state is None or not state.fits(compiled.max_q, compiled.max_r):
+            state = SearchState(compiled.max_q, compiled.max_r) if clusters is None else \
+                SparseState(compiled.max_q, compiled.max_r)
+        state.reset_counts()
+        state.counting = stats is not None
+        if stats is not None:
+            # keep the open list to read its counters after the search
+            queue = open_list_for(queue)
+            before = queue.stats()
+            began = time.perf_counter()
+
+        bound = None
+        effects = None
+        if tuple(start) == tuple(closest_tsr):
+            # already on the treasure, every search gives the path of no moves
+            found = ([tuple(start)], 0.0, 0.0, tuple(start), t1_effect, t2_effect, r1_effect, r2_effect)
+            effects = [found[4:]]
+            if anytime:
+                bound = 1.0
+        elif effect_aware:
+            found = label_search(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state,
+                                 budget)
+        elif anytime:
+            found = None
+            guide = heuristic_for(heuristic)
+            bounding = guide if guide.admissible else "hex"
+            for found, bound, effects in anytime_paths(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect,
+                                                       r2_effect, state, budget, 1.0 if epsilon is None else epsilon,
+                                                       heuristic=bounding, guide=guide):
+                if reporter is not None:
+                    reporter.on_improved(SearchResult(*found, path_events(found[0], compiled, state, effects),
+                                                      state.expanded, bound))
+        elif clusters is not None:
+            found = hierarchical_path(start, closest_tsr, compiled, clusters, t1_effect, t2_effect, r1_effect,
+                                      r2_effect, state, queue, heuristic)
         else:
-            map[r][q] = "x"
+            found = find_path(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state,
+                              queue, heuristic=heuristic)
+        if stats is not None:
+            after = queue.stats()
+            counts.update(searches=1, popped=state.expanded, generated=state.generated,
+                          pushes=after["pushes"] - before["pushes"] + state.pushes,
+                          stale_skipped=after["stale_skipped"] - before["stale_skipped"],
+                          decrease_keys=after["decrease_keys"] - before["decrease_keys"],
+                          pushbacks=state.pushbacks, reopened=state.reopened,
+                          search_s=time.perf_counter() - began, trace_s=state.trace_s)
+        result = None
+        if found is not None:
+            events = path_events(found[0], compiled, state, effects)
+            result = SearchResult(*found, events, state.expanded, bound)
+        if cache is not None:
+            cache.put(key, result)
+    elif stats is not None:
+        counts["cache_hits"] = 1
+    if result is None:
+        if stats is not None:
+            stats.record(counts)
+        return None
+
+    if stats is not None:
+        began = time.perf_counter()
+    if reporter is not None:
+        reporter.on_found(result)
+        for event in result.events:
+            reporter.on_event(event)
+    if apply:
+        mark_path(result.path, compiled)
+    if reporter is not None:
+        reporter.on_map(compiled)
+        reporter.on_done(result)
+        if stats is not None:
+            counts["render_s"] = time.perf_counter() - began
+    if stats is not None:
+        stats.record(counts)
+    return result
 
 
 # A* search to find the treasure nodes
-def a_star_search(start, closest_tsr, map, t1_effect, t2_effect, r1_effect, r2_effect):
-    max_r = len(map)
-    max_q = len(map[0])
+# map is either a list of strings map or a CompiledMap, compile it once and pass it in to avoid recompiling
+# pass the same state between calls to reuse its buffers instead of allocating them per search
+# effect_aware searches (node, trap and reward effects) states with label_search instead of one state per node
+# queue picks the open list engine by name from OPEN_LISTS, or pass an open list to read its counters afterwards
+# cache is a PathCache to look the path up in before searching
+# heuristic is a name from HEURISTICS or a Heuristic to estimate the cost left with
+# stats is a SearchStats to record the search in
+# budget and epsilon run an anytime search that prints each better path, see solve
+# prints the game and marks the path on map, use solve for a quiet search
+def a_star_search(start, closest_tsr, map, t1_effect, t2_effect, r1_effect, r2_effect, state=None,
+                  effect_aware=False, queue="heap", cache=None, heuristic="euclidean", stats=None, budget=None,
+                  epsilon=None):
+    result = solve(map, start, closest_tsr, t1_effect, t2_effect, r1_effect, r2_effect, state, effect_aware, queue,
+                   reporter=PrintReporter(), apply=True, cache=cache, heuristic=heuristic, stats=stats,
+                   budget=budget, epsilon=epsilon)
+    if result is None:
+        return None
+
+    # return the resulting path, amount of energy consumed, number of steps taken, new player
+    # position and reward and trap effects to be carried onto the next iteration
+    return result.as_tuple()
 
-    # initialize closed list (nodes visited)
-    closed_list = [[False for _ in range(max_q)] for _ in range(max_r)]
 
-    # initialize each node
-    nodes = [[Node() for _ in range(max_q)] for _ in range(max_r)]
+# A* search without printing or editing the map
+# returns the same result as a_star_search, or None if the treasure node cannot be reached
+# reopen lets a trap 3 push back update a visited node like the game does, if that loops the path the search
+# is run again without it
+# region and allowed keep the search inside some clusters, node n is only entered if allowed[region[n]] is set
+# heuristic is a name from HEURISTICS or a Heuristic, the work done is added to the counters of state
+def find_path(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state, queue="heap",
+              reopen=True, region=None, allowed=None, heuristic="euclidean"):
+    max_q = compiled.max_q
+    tiles = compiled.tiles
+    degree = compiled.degree
+    neighbours = compiled.neighbours
+    landing = compiled.landing
+    target = closest_tsr[1] * max_q + closest_tsr[0]
+    heuristic = heuristic_for(heuristic)
+    heuristic.prepare(compiled, closest_tsr)
+
+    state.reset()
+    closed = state.closed
+    expanded = 0
+    generated = 0
+    pushbacks = 0
+    reopened = 0
 
     # initialize start node
     q = start[0]
     r = start[1]
-    # set energy consumed
-    nodes[r][q].energy_f = 0.0
-    nodes[r][q].energy_g = 0.0
-    nodes[r][q].energy_h = 0.0
-    # step steps used
-    nodes[r][q].step_f = 0.0
-    nodes[r][q].step_g = 0.0
-    nodes[r][q].step_h = 0.0
-    # set total path cost
-    nodes[r][q].total_g = 0.0
-    nodes[r][q].total_h = 0.0
-    nodes[r][q].total_f = 0.0
+    # set energy consumed, steps used and total path cost
+    update_energy(state, q, r, 0.0, 0.0, 0.0)
+    update_step(state, q, r, 0.0, 0.0, 0.0)
+    update_total(state, q, r, 0.0, 0.0, 0.0)
     # set trap and reward effect
-    nodes[r][q].r1_effect = r1_effect
-    nodes[r][q].r2_effect = r2_effect
-    nodes[r][q].t1_effect = t1_effect
-    nodes[r][q].t2_effect = t2_effect
+    update_t_r_effect(state, q, r, r1_effect, r2_effect, t1_effect, t2_effect)
     # set parent node
-    nodes[r][q].parent_q = q
-    nodes[r][q].parent_r = r
-    # set movement_list
-    nodes[r][q].movement_list = [(0, 0)]
+    update_parent(state, q, r, q, r)
 
     # initialize open list (nodes to visit)
-    open_list = []
+    counting = state.counting
+    open_list = open_list_for(queue, counting)
 
     # insert start node
-    # using priority queue to rank f(n)
-    heapq.heappush(open_list, (0.0, q, r))
+    # using priority queue to rank f(n), ties broken on q then r
+    open_list.push(r * max_q + q, (0.0, q, r))
 
     # loop algorithm while there are still unexplored nodes
     while len(open_list) > 0:
         # pop the node with the smallest f value (lowest priority in heap)
-        n = heapq.heappop(open_list)
+        cur = open_list.pop()
+        if cur is None:
+            break
 
         # mark node as visited
-        q = n[1]
-        r = n[2]
-        closed_list[r][q] = True
+        r, q = divmod(cur, max_q)
+        closed[cur] = state.generation
+        expanded += 1
 
         # check neighbours in all directions [N, NE, SE, S, SW, NW]
-        # determine directional movements based on q
-        if q % 2 == 0:
-            directions = [(0, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0)]
-        else:
-            directions = [(0, -1), (1, -1), (1, 0), (0, 1), (-1, 0), (-1, -1)]
-
-        for (i, j) in directions:
-            new_q = q + i
-            new_r = r + j
-
-            # check if node is within map boundaries and not obstacle
-            if (is_valid(new_q, new_r, max_q, max_r) and not is_obstacle(new_q, new_r, map)
-                    and not closed_list[new_r][new_q]):
-                # if node is valid add to movement
-                nodes[new_r][new_q].movement_list = [(new_q, new_r)]
-
-                # default update of reward and trap effects
-                r1_effect_new = nodes[r][q].r1_effect
-                r2_effect_new = nodes[r][q].r2_effect
-                t1_effect_new = nodes[r][q].t1_effect
-                t2_effect_new = nodes[r][q].t2_effect
-
-                # check if the node is a reward node and handle them
-                if is_reward(new_q, new_r, map):
-                    r1_effect_new, r2_effect_new = handle_reward(new_q, new_r, q, r, map, nodes,
-                                                                 r1_effect_new, r2_effect_new)
-
-                # check if the node is a trap node and handle them
-                if is_trap(new_q, new_r, map):
-                    t1_effect_new, t2_effect_new = handle_trap_1_2(new_q, new_r, q, r, map, nodes,
-                                                                   t1_effect_new, t2_effect_new)
-                if map[new_r][new_q] == "t3":
-                    handle_trap_3(new_q, new_r, map, i, j, nodes)
-
-                # loop for each node in movement
-                # ensures cost for trap 3 is taken into account
-                for (new_q, new_r) in nodes[new_r][new_q].movement_list:
-                    # calculate new f, h and h
-                    # actual cost [g(n)] is calculated with the current g[n] + the new energy cost//step cost
-                    # energy cost and step cost are 1.0 unless affected by trap or reward effects
-                    energy_g_new, step_g_new = (nodes[r][q].energy_g + 1 * nodes[r][q].t1_effect * nodes[r][q].r1_effect,
-                                                nodes[r][q].step_g + 1 * nodes[r][q].t2_effect * nodes[r][q].r2_effect)
-
-                    # estimated cost [h(n)] is calculated with the Euclidean distance from the player location to the
-                    # treasure node
-                    energy_h_new, step_h_new = calc_h(new_q, new_r, closest_tsr)
-                    # include any trap or reward affect that may affect the path
-                    energy_h_new = energy_h_new * r1_effect_new * t1_effect_new
-                    step_h_new = step_h_new * r2_effect_new * t2_effect_new
-
-                    # total cost [f(n)] for energy and step will be h(n) + g(n)
-                    energy_f_new, step_f_new = energy_g_new + energy_h_new, step_g_new + step_h_new
-
-                    # the following are the main h(n), g(n) and f(n) that will be used for decision-making
-                    # using the product of both energy and step to get the cost
-                    total_g_new = energy_g_new + step_g_new
-                    total_h_new = energy_h_new + step_h_new
-
-                    # f(n) = h(n) + g(n)
-                    total_f_new = total_g_new + total_h_new
-
-                    # check if current node is treasure node
-                    if is_treasure(new_q, new_r, closest_tsr):
-                        # set parent for treasure node
-                        nodes[new_r][new_q].parent_r = r
-                        nodes[new_r][new_q].parent_q = q
-
-                        print("Treasure found!")
-
-                        # save resulting path
-                        result_path = (draw_path(nodes, closest_tsr))
-
-                        # notify when trigger any trap or reward
-                        status_update(result_path, map, nodes)
-
-                        # print to show player location and path after each iteration
-                        print_map(map)
-
-                        # record energy consumption and number of steps taken
-                        energy_consumed = energy_f_new
-                        steps_taken = step_f_new
-
-                        # print amount of energy consumed and steps taken on each iteration
-                        print("Energy consumed:", energy_consumed)
-                        print("Steps taken:", steps_taken)
-                        print("Path cost:", energy_consumed + steps_taken)
-
-                        # return the resulting path, amount of energy consumed, number of steps taken, new player
-                        # position and reward and trap effects to be carried onto the next iteration
-                        return (result_path, energy_consumed, steps_taken, (new_q, new_r), t1_effect_new, t2_effect_new,
-                                r1_effect_new, r2_effect_new)
-
-                    # check if node has been explored
-                    elif nodes[new_r][new_q].total_f == float("inf") or nodes[new_r][new_q].total_f > total_f_new:
-                        # add node to open list
-                        heapq.heappush(open_list, (total_f_new, new_q, new_r))
-                        # update node info
-                        update_energy(nodes, new_q, new_r, energy_g_new, energy_h_new, energy_f_new)
-                        update_step(nodes, new_q, new_r, step_g_new, step_h_new, step_f_new)
-                        update_total(nodes, new_q, new_r, total_g_new, total_h_new, total_f_new)
-                        update_parent(nodes, new_q, new_r, q, r)
-                        update_t_r_effect(nodes, new_q, new_r, r1_effect_new, r2_effect_new, t1_effect_new,
-                                          t2_effect_new)
-
-
-def main():
-    # define the map
-    # alphanumeric characters to represent nodes with reward, trap, treasure and obstacle
-    # p - represent player location
-    # g - represent treasure nodes
-    # o - represent obstacle nodes
-    # r1, r2 - represent reward nodes
-    # t1, t2, t3, t4 - represent trap nodes
-    # " " - represent empty nodes
-    map = [
-        ["p", " ", " ", " ", "r1", " ", " ", " ", " ", " "],
-        [" ", "t2", " ", "t4", "g", " ", "t3", " ", "o", " "],
-        [" ", " ", "o", " ", "o", " ", " ", "r2", "t1", " "],
-        ["o", "r1", " ", "o", " ", "t3", "o", "g", " ", "g"],
-        [" ", " ", "t2", "g", "o", " ", "o", "o", " ", " "],
-        [" ", " ", " ", " ", " ", "r2", " ", " ", " ", " "]
-    ]
+        # the neighbour table only holds nodes within map boundaries and not obstacle
+        for k in range(cur * 6, cur * 6 + degree[cur]):
+            nxt = neighbours[k]
+            if closed[nxt] == state.generation:
+                continue
+            tile = tiles[nxt]
 
-    # make copy of map without reference
-    i_map = [
-        ["p", " ", " ", " ", "r1", " ", " ", " ", " ", " "],
-        [" ", "t2", " ", "t4", "g", " ", "t3", " ", "o", " "],
-        [" ", " ", "o", " ", "o", " ", " ", "r2", "t1", " "],
-        ["o", "r1", " ", "o", " ", "t3", "o", "g", " ", "g"],
-        [" ", " ", "t2", "g", "o", " ", "o", "o", " ", " "],
-        [" ", " ", " ", " ", " ", "r2", " ", " ", " ", " "]
-    ]
+            # default update of reward and trap effects
+            r1_effect_new = state.r1_effect[cur]
+            r2_effect_new = state.r2_effect[cur]
+            t1_effect_new = state.t1_effect[cur]
+            t2_effect_new = state.t2_effect[cur]
 
-    # print map before algorithm is run
-    print_map(map)
-    print()
+            # check if the node is a reward node and handle them
+            if tile == REWARD_1 or tile == REWARD_2:
+                r1_effect_new, r2_effect_new = handle_reward(tile, r1_effect_new, r2_effect_new)
 
-    # define start node [q, r]
-    start = (0, 0)
+            # check if the node is a trap node and handle them
+            if tile == TRAP_1 or tile == TRAP_2:
+                t1_effect_new, t2_effect_new = handle_trap_1_2(tile, t1_effect_new, t2_effect_new)
+            elif counting and tile == TRAP_3:
+                pushbacks += 1
 
-    # define list of treasure nodes [q, r]
-    treasures = [(3, 4), (4, 1), (7, 3), (9, 3)]
+            # loop for each node the move lands on, a trap 3 pushes the player back through up to two nodes
+            # ensures cost for trap 3 is taken into account
+            for m in range(2 * k, 2 * k + 2):
+                n = landing[m]
+                # a push back onto a visited node re-parents it and is only followed when reopening
+                if n < 0 or (not reopen and closed[n] == state.generation):
+                    continue
+                if allowed is not None and not allowed[region[n]]:
+                    continue
+                new_r, new_q = divmod(n, max_q)
+                if counting:
+                    generated += 1
+                # calculate new f, h and h
+                # actual cost [g(n)] is calculated with the current g[n] + the new energy cost//step cost
+                # energy cost and step cost are 1.0 unless affected by trap or reward effects
+                energy_g_new, step_g_new = (state.energy_g[cur] + 1 * state.t1_effect[cur] * state.r1_effect[cur],
+                                            state.step_g[cur] + 1 * state.t2_effect[cur] * state.r2_effect[cur])
 
-    # to store the total energy consumption and steps taken
-    total_e = 0
-    total_s = 0
+                # estimated cost [h(n)] is calculated by the heuristic from the player location to the treasure
+                # node, by default the Euclidean distance times any trap or reward effect
+                energy_h_new, step_h_new = heuristic.estimate(new_q, new_r, t1_effect_new, t2_effect_new,
+                                                              r1_effect_new, r2_effect_new)
 
-    # to store the final path
+                # total cost [f(n)] for energy and step will be h(n) + g(n)
+                energy_f_new, step_f_new = energy_g_new + energy_h_new, step_g_new + step_h_new
+
+                # the following are the main h(n), g(n) and f(n) that will be used for decision-making
+                # using the product of both energy and step to get the cost
+                total_g_new = energy_g_new + step_g_new
+                total_h_new = energy_h_new + step_h_new
+
+                # f(n) = h(n) + g(n)
+                total_f_new = total_g_new + total_h_new
+
+                # check if current node is treasure node
+                if new_r * max_q + new_q == target:
+                    # set parent for treasure node
+                    update_parent(state, new_q, new_r, q, r)
+
+                    # a reopened node can make the parent nodes loop, search again without reopening
+                    if counting:
+                        began = time.perf_counter()
+                    path = trace_path(state, closest_tsr)
+                    state.tally(expanded, generated, 0, pushbacks, reopened,
+                                time.perf_counter() - began if counting else 0.0)
+                    if path is None:
+                        return find_path(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect,
+                                         state, queue, False, region, allowed, heuristic)
+
+                    # energy consumed and steps taken are f(n) as h(n) is 0 at the treasure node
+                    return (path, energy_f_new, step_f_new, (new_q, new_r),
+                            t1_effect_new, t2_effect_new, r1_effect_new, r2_effect_new)
+
+                # check if node has been explored
+                elif state.total_f[state.cell(new_q, new_r)] > total_f_new:
+                    if counting and closed[n] == state.generation:
+                        reopened += 1
+                    # add node to open list
+                    open_list.push(new_r * max_q + new_q, (total_f_new, new_q, new_r))
+                    # update node info
+                    update_energy(state, new_q, new_r, energy_g_new, energy_h_new, energy_f_new)
+                    update_step(state, new_q, new_r, step_g_new, step_h_new, step_f_new)
+                    update_total(state, new_q, new_r, total_g_new, total_h_new, total_f_new)
+                    update_parent(state, new_q, new_r, q, r)
+                    update_t_r_effect(state, new_q, new_r, r1_effect_new, r2_effect_new, t1_effect_new,
+                                      t2_effect_new)
+
+    state.tally(expanded, generated, 0, pushbacks, reopened)
+
+
+# weighted A* starts with h(n) inflated by ANYTIME_EPSILON and lowers it by ANYTIME_STEP after each solution
+ANYTIME_EPSILON = 3.0
+ANYTIME_STEP = 0.5
+
+# the deadline is checked every ANYTIME_CHECK expanded nodes
+ANYTIME_CHECK = 256
+
+
+# anytime weighted A* (ARA*), yields (result, bound, effects) each time the path to the treasure node gets cheaper
+# or the bound gets tighter, result as find_path returns it and effects at each node of its path as walk_path
+# returns them
+# the first path is the one find_path finds with guide, so no path yielded costs more than a plain search gives,
+# then a search ordered by guide with h(n) inflated by start_epsilon looks for cheaper ones, lowering the inflation
+# each time and carrying on from the nodes whose cost changed instead of starting again
+# each node keeps one cost, so a dearer way into a node carrying smaller multipliers is dropped, and a node made
+# cheaper leaves the nodes reached from it with the costs they had, the path traced is walked again with walk_path
+# for what it costs
+# bound is how many times the cheapest cost the path costs at most, it comes from the admissible heuristic over the
+# nodes left to expand and the ways in that were dropped, and is only 1.0 once no cheaper path is left
+# guide defaults to heuristic, an inadmissible guide such as "euclidean" finds the first path sooner and has its
+# inflation lowered to 0 instead of 1
+# once the inflation is as low as it goes, label_search looks for the cheapest path with the time left
+# stops once bound is at most epsilon or budget seconds have passed, the first path is always waited for
+def anytime_paths(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state, budget=None,
+                  epsilon=1.0, start_epsilon=ANYTIME_EPSILON, heuristic="hex", guide=None):
+    deadline = None if budget is None else time.perf_counter() + budget
+    max_q = compiled.max_q
+    tiles = compiled.tiles
+    degree = compiled.degree
+    neighbours = compiled.neighbours
+    landing = compiled.landing
+    target = closest_tsr[1] * max_q + closest_tsr[0]
+    heuristic = heuristic_for(heuristic)
+    if not heuristic.admissible:
+        raise ValueError("the bound of an anytime search needs an admissible heuristic, got " + repr(heuristic.name))
+    heuristic.prepare(compiled, closest_tsr)
+    if guide is None or guide == heuristic.name:
+        guide = heuristic
+    else:
+        guide = heuristic_for(guide)
+        guide.prepare(compiled, closest_tsr)
+    # the inflation of an admissible guide bounds the cost on its own, any other guide is lowered until it is off
+    floor = 1.0 if guide.admissible else 0.0
+
+    # the path a plain search finds is the one to beat
+    found = find_path(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state,
+                      heuristic=guide)
+    if found is None:
+        return
+    energy, steps, effects = walk_path(found[0], compiled, t1_effect, t2_effect, r1_effect, r2_effect)
+    best = energy + steps
+    found = ((found[0], energy, steps, tuple(closest_tsr)) + effects[-1], effects)
+    lower = sum(heuristic.estimate(start[0], start[1], t1_effect, t2_effect, r1_effect, r2_effect))
+    best_bound = 1.0 if best <= lower else best / lower
+    yield found[0], best_bound, found[1]
+    if best_bound <= epsilon or (deadline is not None and time.perf_counter() > deadline):
+        return
+
+    state.reset()
+    expanded = 0
+    generated = 0
+    pushbacks = 0
+
+    # initialize start node, total_h is h(n) of guide before the inflation and total_f is g(n) + h(n) of heuristic
+    q = start[0]
+    r = start[1]
+    energy_h, step_h = guide.estimate(q, r, t1_effect, t2_effect, r1_effect, r2_effect)
+    lower = sum(heuristic.estimate(q, r, t1_effect, t2_effect, r1_effect, r2_effect))
+    update_energy(state, q, r, 0.0, energy_h, energy_h)
+    update_step(state, q, r, 0.0, step_h, step_h)
+    update_total(state, q, r, 0.0, energy_h + step_h, lower)
+    update_t_r_effect(state, q, r, r1_effect, r2_effect, t1_effect, t2_effect)
+    update_parent(state, q, r, q, r)
+    state.cell(closest_tsr[0], closest_tsr[1])
+
+    weight = max(start_epsilon, epsilon, floor)
+    counting = state.counting
+    open_list = HeapQueue(counting)
+    open_list.push(r * max_q + q, (weight * (energy_h + step_h), q, r))
+    # nodes expanded with the current weight and nodes made cheaper after they were
+    closed = set()
+    incons = set()
+    # smallest g(n) + h(n) of the ways into a node that were dropped for a cheaper one carrying larger multipliers
+    dropped = INF
+    tallied = 0
+    timed_out = False
+
+    while True:
+        # expand nodes until none can lead to a cheaper treasure node with the current weight
+        while len(open_list) > 0:
+            cur = open_list.pop()
+            r, q = divmod(cur, max_q)
+            key = state.total_g[cur] + weight * state.total_h[cur]
+            if key >= state.total_g[target]:
+                open_list.push(cur, (key, q, r))
+                break
+            if deadline is not None and expanded % ANYTIME_CHECK == 0 and time.perf_counter() > deadline:
+                open_list.push(cur, (key, q, r))
+                timed_out = True
+                break
+            # a node that cannot lead to a path cheaper than the best one walked is left out
+            if state.total_f[cur] >= best:
+                continue
+            closed.add(cur)
+            expanded += 1
+
+            # cost of a move is set by the effects of the node it starts from
+            energy_g_new = state.energy_g[cur] + state.t1_effect[cur] * state.r1_effect[cur]
+            step_g_new = state.step_g[cur] + state.t2_effect[cur] * state.r2_effect[cur]
+            total_g_new = energy_g_new + step_g_new
+            for k in range(cur * 6, cur * 6 + degree[cur]):
+                tile = tiles[neighbours[k]]
+                r1_effect_new = state.r1_effect[cur]
+                r2_effect_new = state.r2_effect[cur]
+                t1_effect_new = state.t1_effect[cur]
+                t2_effect_new = state.t2_effect[cur]
+                if tile == REWARD_1 or tile == REWARD_2:
+                    r1_effect_new, r2_effect_new = handle_reward(tile, r1_effect_new, r2_effect_new)
+                if tile == TRAP_1 or tile == TRAP_2:
+                    t1_effect_new, t2_effect_new = handle_trap_1_2(tile, t1_effect_new, t2_effect_new)
+                elif counting and tile == TRAP_3:
+                    pushbacks += 1
+
+                for m in range(2 * k, 2 * k + 2):
+                    n = landing[m]
+                    if n < 0:
+                        continue
+                    new_r, new_q = divmod(n, max_q)
+                    if counting:
+                        generated += 1
+                    i = state.cell(new_q, new_r)
+                    # the cheaper of the two ways in is kept, the other one only cannot lead to a cheaper path if
+                    # it carries multipliers at least as large
+                    energy_rate = t1_effect_new * r1_effect_new
+                    step_rate = t2_effect_new * r2_effect_new
+                    kept_energy_rate = state.t1_effect[i] * state.r1_effect[i]
+                    kept_step_rate = state.t2_effect[i] * state.r2_effect[i]
+                    if state.total_g[i] <= total_g_new:
+                        if energy_rate < kept_energy_rate or step_rate < kept_step_rate:
+                            dropped = min(dropped, total_g_new + sum(heuristic.estimate(
+                                new_q, new_r, t1_effect_new, t2_effect_new, r1_effect_new, r2_effect_new)))
+                        continue
+                    if state.total_g[i] < INF and (kept_energy_rate < energy_rate or kept_step_rate < step_rate):
+                        dropped = min(dropped, state.total_f[i])
+                    energy_h, step_h = guide.estimate(new_q, new_r, t1_effect_new, t2_effect_new, r1_effect_new,
+                                                      r2_effect_new)
+                    if guide is not heuristic:
+                        lower = sum(heuristic.estimate(new_q, new_r, t1_effect_new, t2_effect_new, r1_effect_new,
+                                                       r2_effect_new))
+                    else:
+                        lower = energy_h + step_h
+                    update_energy(state, new_q, new_r, energy_g_new, energy_h, energy_g_new + energy_h)
+                    update_step(state, new_q, new_r, step_g_new, step_h, step_g_new + step_h)
+                    update_total(state, new_q, new_r, total_g_new, energy_h + step_h, total_g_new + lower)
+                    update_parent(state, new_q, new_r, q, r)
+                    update_t_r_effect(state, new_q, new_r, r1_effect_new, r2_effect_new, t1_effect_new,
+                                      t2_effect_new)
+                    # a node expanded with this weight waits for the next one
+                    if n in closed:
+                        incons.add(n)
+                    else:
+                        open_list.push(n, (total_g_new + weight * (energy_h + step_h), new_q, new_r))
+
+        # the path traced can cost more than the cost kept at the treasure node, keep the cheapest one walked
+        if counting:
+            began = time.perf_counter()
+        path = None if state.total_g[target] == INF else trace_path(state, closest_tsr)
+        trace_s = time.perf_counter() - began if counting else 0.0
+        improved = False
+        if path is not None:
+            energy, steps, effects = walk_path(path, compiled, t1_effect, t2_effect, r1_effect, r2_effect)
+            if energy + steps < best:
+                best = energy + steps
+                found = ((path, energy, steps, tuple(closest_tsr)) + effects[-1], effects)
+                improved = True
+
+        # the cheapest path costs at least the smallest g(n) + h(n) of the nodes left to expand and of the ways in
+        # that were dropped, an admissible guide also bounds it by its weight once every node below the weight was
+        # expanded and none were dropped
+        lower = min([state.total_f[n] for n in open_list.key] + [state.total_f[n] for n in incons], default=INF)
+        lower = min(lower, dropped)
+        bound = 1.0 if best <= lower else best / lower
+        if guide.admissible and not timed_out and dropped == INF and state.total_g[target] < INF:
+            bound = min(bound, max(1.0, weight * best / state.total_g[target]))
+        if improved or bound < best_bound:
+            best_bound = bound
+            state.tally(expanded, generated, open_list.pushes - tallied, pushbacks, 0, trace_s)
+            expanded = generated = pushbacks = 0
+            tallied = open_list.pushes
+            yield found[0], bound, found[1]
+        if bound <= epsilon or timed_out or (deadline is not None and time.perf_counter() > deadline):
+            state.tally(expanded, generated, open_list.pushes - tallied, pushbacks)
+            return
+        if weight <= floor:
+            break
+
+        # lower the weight and put the nodes made cheaper back with every node still open
+        weight = max(weight - ANYTIME_STEP, floor)
+        waiting = list(open_list.key) + [n for n in incons if n not in open_list.key]
+        open_list.clear()
+        for n in waiting:
+            r, q = divmod(n, max_q)
+            open_list.push(n, (state.total_g[n] + weight * state.total_h[n], q, r))
+        closed = set()
+        incons = set()
+
+    # keeping one cost per node can miss the cheapest path, the effect aware search does not
+    state.tally(expanded, generated, open_list.pushes - tallied, pushbacks)
+    left = None if deadline is None else max(0.0, deadline - time.perf_counter())
+    labelled = label_search(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state, left)
+    finished = deadline is None or time.perf_counter() <= deadline
+    energy, steps, effects = walk_path(labelled[0], compiled, t1_effect, t2_effect, r1_effect, r2_effect)
+    if energy + steps < best:
+        best = energy + steps
+        found = ((labelled[0], energy, steps, tuple(closest_tsr)) + effects[-1], effects)
+        bound = 1.0 if finished or best <= lower else best / lower
+        yield found[0], bound, found[1]
+    elif finished and best_bound > 1.0:
+        yield found[0], 1.0, found[1]
+
+
+# clusters are CLUSTER_SIZE by CLUSTER_SIZE nodes unless told otherwise
+CLUSTER_SIZE = 16
+
+# a move with no trap or reward effect costs 1.0 energy and 1.0 step
+NEUTRAL_MOVE = 2.0
+
+# which nodes are open (0), blocked (1) or trap 3 (2), the only things a ClusterMap depends on
+# marking a path with "x" and "p" keeps the layout unless the path lands on a trap 3
+LAYOUT = bytes(1 if code == OBSTACLE or code == TRAP_4 else 2 if code == TRAP_3 else 0 for code in range(256))
+
+
+# layout of every node and its hash
+def layout_of(compiled):
+    layout = compiled.tiles.translate(LAYOUT)
+    return layout, hashlib.sha1(str(compiled.max_q).encode() + b":" + layout).hexdigest()
+
+
+# abstract graph over a map split into square clusters of nodes, for searching very large maps (HPA*)
+# entrances are nodes on either side of a move between clusters, one move in the middle of each run of moves
+# between two clusters, and entrances in the same cluster are joined by the cost of moving between them inside it
+# costs leave out trap and reward effects, the path found is searched again with them inside the chosen clusters
+# build it once with ClusterMap(compiled), then save and load it to reuse it for the same layout
+class ClusterMap:
+    def __init__(self, compiled, size=CLUSTER_SIZE, edges=None):
+        if size < 1:
+            raise ValueError("cluster size must be at least 1, got " + str(size))
+        self.compiled = compiled
+        self.version = compiled.version
+        self.layout, self.digest = layout_of(compiled)
+        self.reach = push_reach(compiled)
+        self.size = size
+        self.columns = -(-compiled.max_q // size)
+        self.rows = -(-compiled.max_r // size)
+        # cluster of each node, repeating the clusters of one row for every row of a row of clusters
+        self.region = array("i")
+        for row in range(self.rows):
+            line = array("i", [row * self.columns + q // size for q in range(compiled.max_q)])
+            self.region.extend(line * (min((row + 1) * size, compiled.max_r) - row * size))
+
+        # abstract edges (entrance, cost) leaving each entrance, and the entrances of each cluster
+        self.edges = {}
+        self.entrances = collections.defaultdict(list)
+        if edges is None:
+            self.build(range(self.columns * self.rows))
+        else:
+            self.edges = edges
+            for e in sorted(edges):
+                self.entrances[self.region[e]].append(e)
+
+    # clusters within reach of a move from any of clusters, a trap 3 can push the player three nodes
+    def around(self, clusters):
+        reach = -(-3 // self.size)
+        near = set()
+        for c in clusters:
+            row, column = divmod(c, self.columns)
+            for near_row in range(max(row - reach, 0), min(row + reach + 1, self.rows)):
+                for near_column in range(max(column - reach, 0), min(column + reach + 1, self.columns)):
+                    near.add(near_row * self.columns + near_column)
+        return near
+
+    # nodes of cluster c
+    def nodes(self, c):
+        max_q = self.compiled.max_q
+        row, column = divmod(c, self.columns)
+        for r in range(row * self.size, min((row + 1) * self.size, self.compiled.max_r)):
+            yield from range(r * max_q + column * self.size, r * max_q + min((column + 1) * self.size, max_q))
+
+    # nodes each node of cluster c lands on without leaving it
+    def moves(self, c):
+        degree = self.compiled.degree
+        landing = self.compiled.landing
+        region = self.region
+        return {u: [n for n in landing[u * 12:u * 12 + 2 * degree[u]] if n >= 0 and region[n] == c]
+                for u in self.nodes(c)}
+
+    # move count from source to the nodes it reaches without leaving its cluster, stopping once every goal is reached
+    # inside is the moves of the cluster, pass it in when searching from many nodes of the same cluster
+    def hops(self, source, goals, inside=None):
+        if inside is None:
+            inside = self.moves(self.region[source])
+        # a move at a time, the nodes first reached by each move found with set operations
+        goals = set(goals)
+        seen = {source: 0}
+        frontier = [source]
+        moves = 0
+        while len(frontier) > 0 and not goals <= seen.keys():
+            moves += 1
+            frontier = set().union(*[inside[u] for u in frontier]).difference(seen)
+            seen.update(dict.fromkeys(frontier, moves))
+        return seen
+
+    # pick the entrances of moves into or out of the changed clusters and join the entrances again around them
+    def build(self, changed):
+        compiled = self.compiled
+        landing = compiled.landing
+        region = self.region
+        edges = self.edges
+        changed = set(changed)
+        near = self.around(changed)
+
+        # keep only the moves between clusters that did not change
+        for c in near:
+            for e in self.entrances.pop(c, []):
+                kept = [(n, cost) for (n, cost) in edges.pop(e)
+                        if region[n] != c and region[n] not in changed and c not in changed]
+                if len(kept) > 0:
+                    edges[e] = kept
+        for e in list(edges):
+            for (n, cost) in edges[e]:
+                if region[n] in near:
+                    edges.setdefault(n, [])
+
+        # moves into or out of the changed clusters grouped by the clusters they leave and enter
+        crossings = collections.defaultdict(list)
+        for c in near:
+            for u in self.nodes(c):
+                if compiled.tiles[u] == OBSTACLE or compiled.tiles[u] == TRAP_4:
+                    continue
+                for m in range(u * 12, u * 12 + 12):
+                    n = landing[m]
+                    if n >= 0 and region[n] != c and (c in changed or region[n] in changed):
+                        crossings[(c, region[n])].append((u, n))
+
+        for moves in crossings.values():
+            # moves from neighbouring nodes belong to the same run
+            sources = {u for (u, n) in moves}
+            run_of = {}
+            for u in sorted(sources):
+                if u in run_of:
+                    continue
+                run_of[u] = u
+                frontier = [u]
+                while len(frontier) > 0:
+                    v = frontier.pop()
+                    for w in compiled.neighbours[v * 6:v * 6 + compiled.degree[v]]:
+                        if w in sources and w not in run_of:
+                            run_of[w] = u
+                            frontier.append(w)
+            runs = collections.defaultdict(list)
+            for (u, n) in sorted(moves):
+                runs[run_of[u]].append((u, n))
+            for run in runs.values():
+                u, n = run[len(run) // 2]
+                edges.setdefault(u, []).append((n, NEUTRAL_MOVE))
+                edges.setdefault(n, [])
+
+        # join the entrances of each cluster around the change
+        for e in sorted(edges):
+            if region[e] in near:
+                self.entrances[region[e]].append(e)
+        for c in near:
+            inside = self.moves(c)
+            for e in self.entrances[c]:
+                seen = self.hops(e, self.entrances[c], inside)
+                for f in self.entrances[c]:
+                    if f != e and f in seen:
+                        edges[e].append((f, NEUTRAL_MOVE * seen[f]))
+
+    # search compiled from now on, rebuilding the clusters around any node whose layout changed
+    def use(self, compiled):
+        if compiled is self.compiled and compiled.version == self.version:
+            return
+        if (compiled.max_q, compiled.max_r) != (self.compiled.max_q, self.compiled.max_r):
+            raise ValueError("the cluster map was built for a map of another size")
+        self.compiled = compiled
+        self.version = compiled.version
+        layout, digest = layout_of(compiled)
+        if digest == self.digest:
+            return
+
+        # compare the layouts a block at a time to find the changed nodes
+        changed = set()
+        block = 4096
+        for i in range(0, len(layout), block):
+            if layout[i:i + block] != self.layout[i:i + block]:
+                for n in range(i, min(i + block, len(layout))):
+                    if layout[n] != self.layout[n]:
+                        changed.add(self.region[n])
+        self.layout, self.digest = layout, digest
+        self.reach = push_reach(compiled)
+        # a change also moves the landings of nodes up to three away, in the clusters next to it
+        self.build(self.around(changed))
+
+    # entrances from start to tsr in the abstract graph, with start and tsr at the ends, or None if there is no way
+    def abstract_path(self, start, tsr):
+        max_q = self.compiled.max_q
+        source = start[1] * max_q + start[0]
+        target = tsr[1] * max_q + tsr[0]
+
+        # join start and tsr to the entrances of their clusters for this query only
+        first = []
+        seen = self.hops(source, self.entrances[self.region[source]] + [target])
+        if target in seen:
+            first.append((target, NEUTRAL_MOVE * seen[target]))
+        for e in self.entrances[self.region[source]]:
+            if e in seen:
+                first.append((e, NEUTRAL_MOVE * seen[e]))
+        last = {}
+        inside = self.moves(self.region[target])
+        for e in self.entrances[self.region[target]]:
+            seen = self.hops(e, [target], inside)
+            if target in seen:
+                last[e] = NEUTRAL_MOVE * seen[target]
+
+        # A* over the entrances, a move covers at most reach hex distance and costs NEUTRAL_MOVE
+        reach = self.reach
+        cost = {source: 0.0}
+        parent = {source: source}
+        open_list = [(0.0, 0.0, source)]
+        while len(open_list) > 0:
+            f, g, u = heapq.heappop(open_list)
+            if g > cost[u]:
+                continue
+            if u == target:
+                route = [u]
+                while u != source:
+                    u = parent[u]
+                    route.append(u)
+                route.reverse()
+                return [(n % max_q, n // max_q) for n in route]
+            if u == source:
+                moves = first
+            else:
+                moves = self.edges[u]
+                if u in last:
+                    moves = moves + [(target, last[u])]
+            for (n, move) in moves:
+                if g + move < cost.get(n, INF):
+                    cost[n] = g + move
+                    parent[n] = u
+                    h = NEUTRAL_MOVE * -(-hex_distance(n % max_q, n // max_q, tsr[0], tsr[1]) // reach)
+                    heapq.heappush(open_list, (g + move + h, g + move, n))
+        return None
+
+    # clusters a route goes through, as the allowed flags find_path takes
+    def corridor(self, route):
+        allowed = bytearray(self.columns * self.rows)
+        for (q, r) in route:
+            allowed[self.region[r * self.compiled.max_q + q]] = 1
+        return allowed
+
+    # write the abstract graph to a JSON file
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"max_q": self.compiled.max_q, "max_r": self.compiled.max_r, "size": self.size,
+                       "layout": self.digest,
+                       "edges": [[e, n, cost] for e in sorted(self.edges) for (n, cost) in self.edges[e]]}, f)
+
+    # read an abstract graph saved for a map with the same layout as compiled
+    @classmethod
+    def load(cls, path, compiled):
+        with open(path) as f:
+            saved = json.load(f)
+        if (saved["max_q"], saved["max_r"]) != (compiled.max_q, compiled.max_r) \
+                or saved["layout"] != layout_of(compiled)[1]:
+            raise ValueError(path + " was built for another map layout")
+        edges = {}
+        for (e, n, cost) in saved["edges"]:
+            edges.setdefault(e, []).append((n, cost))
+            edges.setdefault(n, [])
+        return cls(compiled, saved["size"], edges)
+
+
+# A* search that follows the abstract graph of clusters, only looking at the nodes of the clusters on the abstract
+# path, the path can cost more than the one find_path finds as the abstract graph leaves out trap and reward effects
+# the whole map is searched if the clusters have no path, in state like the rest, a SparseState then grows with it
+def hierarchical_path(start, closest_tsr, compiled, clusters, t1_effect, t2_effect, r1_effect, r2_effect, state,
+                      queue="heap", heuristic="euclidean"):
+    clusters.use(compiled)
+    route = clusters.abstract_path(start, closest_tsr)
+    if route is not None:
+        found = find_path(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state, queue,
+                          region=clusters.region, allowed=clusters.corridor(route), heuristic=heuristic)
+        if found is not None:
+            return found
+    return find_path(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state, queue,
+                     heuristic=heuristic)
+
+
+# labels label_search makes at most before it settles for the cheapest path found so far, about half a minute of
+# searching and a few hundred megabytes
+LABEL_LIMIT = 300000
+
+
+# search over (node, trap and reward effects) states to find the treasure node
+# find_path keeps one state per node, so a path that picks up a reward first can be thrown away for a cheaper
+# looking one, this keeps every label at a node that no other label there beats in cost and both multipliers
+# rewards are used up once picked up on a path and traps fire every time they are stepped on
+# the paths find_path finds are walked for their cost first and labels are popped by g(n) + h(n), where h(n) counts
+# the fewest moves left and how many rewards are near enough to make them cheaper, a label whose g(n) + h(n) is over
+# the cheapest path found so far is dropped, and the path find_path found is returned if no label does better
+# stops after budget seconds if given, or once LABEL_LIMIT labels were made, returning the cheapest path found by
+# then, which is never dearer than the path find_path found
+# returns the same result as find_path, with the path's effects written into state for status_update
+def label_search(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state, budget=None):
+    deadline = None if budget is None else time.perf_counter() + budget
+    max_q = compiled.max_q
+    tiles = compiled.tiles
+    degree = compiled.degree
+    neighbours = compiled.neighbours
+    landing = compiled.landing
+    target = closest_tsr[1] * max_q + closest_tsr[0]
+
+    # the cheaper of the paths find_path finds with either estimate is the path to beat, or the cheapest label at
+    # the treasure node once there is one
+    best = INF
+    best_label = None
+    for guide in ("euclidean", "hex"):
+        found = find_path(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state,
+                          heuristic=guide)
+        if found is None:
+            return None
+        energy, steps, effects = walk_path(found[0], compiled, t1_effect, t2_effect, r1_effect, r2_effect)
+        if energy + steps < best:
+            best = energy + steps
+            best_path = (found[0], energy, steps, effects)
+
+    # fewest moves from every node to the treasure node, -1 where there is no way, and the most hex distance a move
+    # covers
+    landmarks = LandmarkHeuristic(0)
+    landmarks.build(compiled)
+    moves_left = landmarks.hops(compiled, target, backward=True)
+    reach = push_reach(compiled)
+    energy_counts, step_counts = compiled.reward_counts()
+    # costs of the first moves from each node reached at multipliers of 1.0, see below
+    unit_costs = {}
+
+    # the rewards picked up in the first i moves from node n lie within i moves of it, so move i costs at least 0.5
+    # to the power of how many rewards there are that close, which is much tighter than discounted_moves away from
+    # the rewards
+    # returns the energy and steps the first moves moves from n cost at least
+    def unit_cost(n, moves):
+        costs = unit_costs.setdefault(n, [(0.0, 0.0)])
+        if len(costs) <= moves:
+            r, q = divmod(n, max_q)
+            energy, step = costs[-1]
+            for i in range(len(costs) - 1, moves):
+                near = i * reach
+                energy += 0.5 ** min(i, box_count(energy_counts, compiled, q, r, near))
+                step += 0.5 ** min(i, box_count(step_counts, compiled, q, r, near))
+                costs.append((energy, step))
+        return costs[moves]
+
+    # fewest moves to step onto a reward from node n and then reach the treasure node, a reward with no way on to
+    # the treasure node takes -1 off, which only makes it look closer
+    def reward_moves(n, reward):
+        r, q = divmod(n, max_q)
+        reward_r, reward_q = divmod(reward, max_q)
+        return -(-hex_distance(q, r, reward_q, reward_r) // reach) + moves_left[reward]
+
+    # least energy and steps at multipliers of 1.0 going from node n onto a reward and on to the treasure node
+    reward_costs = {}
+
+    # a label at node n with total cost and multipliers can still pick up reward for less than the cheapest path
+    # found so far
+    def worth(n, reward, total, energy_rate, step_rate):
+        key = (n, reward)
+        if key not in reward_costs:
+            reward_costs[key] = unit_cost(n, reward_moves(n, reward))
+        unit_energy, unit_step = reward_costs[key]
+        return total + energy_rate * unit_energy + step_rate * unit_step <= best
+
+    # label a beats label b at node n if a costs no more and, on any way on from n, carries multipliers no larger
+    # the rewards a has used up and b has not are the only ones b can gain from over a, each halving one of b's
+    # multipliers once, so a beats b if its multipliers are no larger than b's halved once for each of them that
+    # b can still pick up for less than the cheapest path found so far
+    # this only counts the rewards, so labels that used up different rewards can beat each other
+    def beats(a, n, total, energy_rate, step_rate, used):
+        energy_limit = energy_rate
+        step_limit = step_rate
+        if lab_total[a] > total or lab_energy_rate[a] > energy_limit or lab_step_rate[a] > step_limit:
+            return False
+        for reward in lab_used[a] - used:
+            if not worth(n, reward, total, energy_rate, step_rate):
+                continue
+            if tiles[reward] == REWARD_1:
+                energy_limit *= 0.5
+                if lab_energy_rate[a] > energy_limit:
+                    return False
+            else:
+                step_limit *= 0.5
+                if lab_step_rate[a] > step_limit:
+                    return False
+        return True
+
+    # each label is an index into these lists
+    lab_node = []
+    lab_energy = []
+    lab_step = []
+    lab_total = []
+    lab_effects = []
+    lab_energy_rate = []
+    lab_step_rate = []
+    lab_parent = []
+    # rewards picked up on the way to the label
+    lab_used = []
+    lab_alive = []
+    # live labels at each node
+    at_node = {}
+
+    # a new label at node n is kept unless a label there beats it, and the labels it beats are dropped
+    def push_label(n, energy, step, effects, parent, used):
+        total = energy + step
+        energy_rate = effects[0] * effects[2]
+        step_rate = effects[1] * effects[3]
+        labels = at_node.setdefault(n, [])
+        for other in labels:
+            if beats(other, n, total, energy_rate, step_rate, used):
+                return None
+        label = len(lab_node)
+        # drop the labels the new one beats, their heap entries are skipped when popped
+        lab_total.append(total)
+        lab_energy_rate.append(energy_rate)
+        lab_step_rate.append(step_rate)
+        lab_used.append(used)
+        kept = []
+        for other in labels:
+            if beats(label, n, lab_total[other], lab_energy_rate[other], lab_step_rate[other], lab_used[other]):
+                lab_alive[other] = False
+            else:
+                kept.append(other)
+        lab_node.append(n)
+        lab_energy.append(energy)
+        lab_step.append(step)
+        lab_effects.append(effects)
+        lab_parent.append(parent)
+        lab_alive.append(True)
+        kept.append(label)
+        at_node[n] = kept
+        return label
+
+    start_label = push_label(start[1] * max_q + start[0], 0.0, 0.0, (t1_effect, t2_effect, r1_effect, r2_effect),
+                             -1, frozenset())
+    open_list = [(0.0, start_label)]
+    counting = state.counting
+    expanded = 0
+    generated = 0
+    pushes = 0
+    pushbacks = 0
+
+    while len(open_list) > 0:
+        f, label = heapq.heappop(open_list)
+        if not lab_alive[label] or f > best:
+            continue
+        cur = lab_node[label]
+        # labels are popped by g(n) + h(n) and h(n) never overestimates, so the first one at the treasure node is
+        # the cheapest path
+        if cur == target or len(lab_node) >= LABEL_LIMIT or (deadline is not None and expanded % ANYTIME_CHECK == 0
+                                                              and time.perf_counter() > deadline):
+            break
+        expanded += 1
+
+        t1, t2, r1, r2 = lab_effects[label]
+        used = lab_used[label]
+        # every move costs the multipliers of the node it starts from
+        energy_new = lab_energy[label] + t1 * r1
+        step_new = lab_step[label] + t2 * r2
+
+        for k in range(cur * 6, cur * 6 + degree[cur]):
+            nxt = neighbours[k]
+            tile = tiles[nxt]
+            used_new = used
+            effects_new = (t1, t2, r1, r2)
+
+            if tile == REWARD_1 or tile == REWARD_2:
+                if nxt not in used:
+                    r1_new, r2_new = handle_reward(tile, r1, r2)
+                    effects_new = (t1, t2, r1_new, r2_new)
+                    used_new = used | {nxt}
+            elif tile == TRAP_1 or tile == TRAP_2:
+                t1_new, t2_new = handle_trap_1_2(tile, t1, t2)
+                effects_new = (t1_new, t2_new, r1, r2)
+            elif counting and tile == TRAP_3:
+                pushbacks += 1
+
+            for m in range(2 * k, 2 * k + 2):
+                n = landing[m]
+                if n < 0:
+                    continue
+                if counting:
+                    generated += 1
+                if moves_left[n] < 0:
+                    continue
+                unit_energy, unit_step = unit_cost(n, moves_left[n])
+                f_new = (energy_new + step_new + unit_energy * effects_new[0] * effects_new[2]
+                         + unit_step * effects_new[1] * effects_new[3])
+                if f_new > best:
+                    continue
+                new_label = push_label(n, energy_new, step_new, effects_new, label, used_new)
+                if new_label is not None:
+                    heapq.heappush(open_list, (f_new, new_label))
+                    if counting:
+                        pushes += 1
+                    # a cheaper path to the treasure node leaves less room for the labels still open
+                    if n == target:
+                        best = energy_new + step_new
+                        best_label = new_label
+
+    if counting:
+        began = time.perf_counter()
+    if best_label is not None:
+        chain = []
+        label = best_label
+        while label != -1:
+            chain.append(label)
+            label = lab_parent[label]
+        chain.reverse()
+        path = []
+        for label in chain:
+            r, q = divmod(lab_node[label], max_q)
+            path.append((q, r))
+        best_path = (path, lab_energy[best_label], lab_step[best_label], [lab_effects[label] for label in chain])
+
+    # write the effects along the path for status_update
+    path, energy, steps, effects = best_path
+    state.reset()
+    for (q, r), (t1, t2, r1, r2) in zip(path, effects):
+        update_t_r_effect(state, q, r, r1, r2, t1, t2)
+    state.tally(expanded, generated, pushes, pushbacks, 0, time.perf_counter() - began if counting else 0.0)
+    return (path, energy, steps, tuple(closest_tsr)) + effects[-1]
+
+
+# treasure counts up to this are ordered exactly, larger tours use local search
+HELD_KARP_LIMIT = 10
+
+
+# Dijkstra search from source over the whole reachable map, with the same energy and step cost and trap 3 push
+# back as a_star_search
+# each node keeps its cheapest way in, ties broken on the multipliers carried and then the parent node so the
+# result does not depend on the order nodes are expanded in
+# stops early once every node in targets (a list of [q, r]) is settled, the paths are left in state
+# returns the total path cost of every node indexed by r * max_q + q, inf where it was not reached
+def distance_field(source, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state, targets=None):
+    max_q = compiled.max_q
+    tiles = compiled.tiles
+    degree = compiled.degree
+    neighbours = compiled.neighbours
+    landing = compiled.landing
+
+    state.reset()
+    closed = state.closed
+    energy_g = state.energy_g
+    step_g = state.step_g
+    total_g = state.total_g
+
+    # targets not settled yet
+    left = None
+    if targets is not None:
+        left = {r * max_q + q for (q, r) in targets}
+
+    # initialize source node
+    q, r = source
+    update_energy(state, q, r, 0.0, 0.0, 0.0)
+    update_step(state, q, r, 0.0, 0.0, 0.0)
+    update_total(state, q, r, 0.0, 0.0, 0.0)
+    update_t_r_effect(state, q, r, r1_effect, r2_effect, t1_effect, t2_effect)
+    update_parent(state, q, r, q, r)
+
+    open_list = [(0.0, r * max_q + q)]
+    expanded = 0
+    while len(open_list) > 0:
+        g, cur = heapq.heappop(open_list)
+        # skip nodes already settled through a cheaper entry
+        if closed[cur] == state.generation:
+            continue
+        closed[cur] = state.generation
+        expanded += 1
+        if left is not None:
+            left.discard(cur)
+            if len(left) == 0:
+                break
+
+        r, q = divmod(cur, max_q)
+        t1_effect = state.t1_effect[cur]
+        t2_effect = state.t2_effect[cur]
+        r1_effect = state.r1_effect[cur]
+        r2_effect = state.r2_effect[cur]
+        # every move costs the multipliers of the node it starts from
+        energy_new = energy_g[cur] + t1_effect * r1_effect
+        step_new = step_g[cur] + t2_effect * r2_effect
+        total_new = energy_new + step_new
+
+        for k in range(cur * 6, cur * 6 + degree[cur]):
+            nxt = neighbours[k]
+            tile = tiles[nxt]
+            r1_effect_new, r2_effect_new = handle_reward(tile, r1_effect, r2_effect)
+            t1_effect_new, t2_effect_new = handle_trap_1_2(tile, t1_effect, t2_effect)
+
+            # a trap 3 node can be settled by landing on it and still push back players stepping onto it
+            for m in range(2 * k, 2 * k + 2):
+                n = landing[m]
+                if n < 0 or closed[n] == state.generation:
+                    continue
+                new_r, new_q = divmod(n, max_q)
+                state.cell(new_q, new_r)
+                # keep the cheaper way in, on a tie the one carrying smaller multipliers
+                if total_new > total_g[n]:
+                    continue
+                if total_new == total_g[n]:
+                    if ((t1_effect_new * r1_effect_new, t2_effect_new * r2_effect_new, cur)
+                            >= (state.t1_effect[n] * state.r1_effect[n], state.t2_effect[n] * state.r2_effect[n],
+                                state.parent[n])):
+                        continue
+                heapq.heappush(open_list, (total_new, n))
+                update_energy(state, new_q, new_r, energy_new, 0.0, energy_new)
+                update_step(state, new_q, new_r, step_new, 0.0, step_new)
+                update_total(state, new_q, new_r, total_new, 0.0, total_new)
+                update_parent(state, new_q, new_r, q, r)
+                update_t_r_effect(state, new_q, new_r, r1_effect_new, r2_effect_new, t1_effect_new, t2_effect_new)
+
+    state.tally(expanded)
+    # copy out the cost of every node settled in this search
+    field = array("d", [INF]) * (max_q * compiled.max_r)
+    for n in range(len(field)):
+        if closed[n] == state.generation:
+            field[n] = total_g[n]
+    return field
+
+
+# result of the leg to tsr after distance_field, in the same form as find_path, or None if it was not reached
+def field_leg(state, tsr):
+    n = state.cell(tsr[0], tsr[1])
+    if state.total_g[n] == INF:
+        return None
+    return (trace_path(state, tsr), state.energy_g[n], state.step_g[n], tuple(tsr),
+            state.t1_effect[n], state.t2_effect[n], state.r1_effect[n], state.r2_effect[n])
+
+
+# cost of every leg between the start and the treasures with no trap or reward effect, using one distance_field
+# sweep per point instead of one search per pair
+# legs[a][b] is the field_leg result from point a to point b, where point 0 is the start and point k is treasure k-1
+def cost_matrix(compiled, start, treasures, state):
+    points = [start] + list(treasures)
+    legs = [[None] * len(points) for _ in points]
+    for a in range(len(points)):
+        distance_field(points[a], compiled, 1.0, 1.0, 1.0, 1.0, state,
+                       targets=[points[b] for b in range(1, len(points)) if b != a])
+        for b in range(1, len(points)):
+            if a != b:
+                legs[a][b] = field_leg(state, points[b])
+    return legs
+
+
+# t3 pushes of a map for wavefront_field, the landings of every move onto a t3 node grouped by the node moved from
+# the pushes from node n are pushes[1][pushes[0][n]:pushes[0][n + 1]]
+def wavefront_pushes(compiled):
+    size = compiled.max_q * compiled.max_r
+    tiles = numpy.frombuffer(compiled.tiles, dtype=numpy.uint8)
+    neighbours = numpy.frombuffer(compiled.neighbours, dtype=compiled.neighbours.typecode)
+    landing = numpy.frombuffer(compiled.landing, dtype=compiled.landing.typecode).reshape(-1, 2)
+    pushed = numpy.nonzero((neighbours >= 0) & (tiles[numpy.maximum(neighbours, 0)] == TRAP_3))[0]
+    froms = numpy.repeat(pushed // 6, 2)
+    lands = landing[pushed].ravel()
+    froms, lands = froms[lands >= 0], lands[lands >= 0]
+    return numpy.searchsorted(froms, numpy.arange(size + 1)), lands
+
+
+# energy plus step cost of reaching every node from source, the field distance_field returns, as a max_r by max_q
+# numpy array computed with array operations over a whole front of nodes at a time instead of a node at a time
+# the front is every node whose cost is the lowest not settled yet, all of them are settled at once and moved on
+# from in the six directions, through the node grid with the column offsets of odd and even columns, and through
+# the t3 pushes, each node keeps the cheapest way in, on a tie the one carrying smaller multipliers and then the
+# one from the smaller node, as distance_field does
+# the fields are the same but for rounding where enough rewards make moves too cheap to change a cost in floating
+# point, distance_field settles nodes of one cost a node at a time there and they can still relabel each other
+# plain passes over the whole map do not settle as a node's multipliers depend on the way in, a pass can keep
+# going round a reward, lowering them further each time
+# there are about as many fronts as distinct costs, so this pays on large maps rather than on small ones
+# pass the wavefront_pushes of the map as pushes to reuse them for fields from many sources
+def wavefront_field(source, compiled, t1_effect=1.0, t2_effect=1.0, r1_effect=1.0, r2_effect=1.0, pushes=None):
+    if numpy is None:
+        raise ImportError("wavefront_field needs numpy")
+    max_q, max_r = compiled.max_q, compiled.max_r
+    size = max_q * max_r
+    if pushes is None:
+        pushes = wavefront_pushes(compiled)
+    push_start, push_to = pushes
+    tiles = numpy.frombuffer(compiled.tiles, dtype=numpy.uint8)
+    # nodes a move can end on, a move onto a t3 node ends where the push does
+    enter = (tiles != OBSTACLE) & (tiles != TRAP_4) & (tiles != TRAP_3)
+    # what moving onto each node does to the energy and step multipliers
+    energy_factor = numpy.where(tiles == TRAP_1, 2.0, numpy.where(tiles == REWARD_1, 0.5, 1.0))
+    step_factor = numpy.where(tiles == TRAP_2, 2.0, numpy.where(tiles == REWARD_2, 0.5, 1.0))
+
+    energy = numpy.full(size, INF)
+    step = numpy.full(size, INF)
+    total = numpy.full(size, INF)
+    energy_mult = numpy.ones(size)
+    step_mult = numpy.ones(size)
+    parent = numpy.full(size, size)
+    settled = numpy.zeros(size, dtype=bool)
+    s = source[1] * max_q + source[0]
+    energy[s] = step[s] = total[s] = 0.0
+    energy_mult[s] = t1_effect * r1_effect
+    step_mult[s] = t2_effect * r2_effect
+
+    # nodes offered each cost not settled yet, a node can be listed under costs it no longer has
+    fronts = {0.0: [numpy.array([s])]}
+    costs = [0.0]
+    while len(costs) > 0:
+        cost = heapq.heappop(costs)
+        front = numpy.unique(numpy.concatenate(fronts.pop(cost)))
+        front = front[(total[front] == cost) & ~settled[front]]
+        if len(front) == 0:
+            continue
+
+        # every move costs the multipliers of the node it starts from
+        energy_new = energy[front] + energy_mult[front]
+        step_new = step[front] + step_mult[front]
+        q = front % max_q
+        r = front // max_q
+        odd = q % 2 == 1
+        froms = []
+        lands = []
+        for d in range(6):
+            i = DIRECTIONS[0][d][0]
+            land_q = q + i
+            land_r = r + numpy.where(odd, DIRECTIONS[1][d][1], DIRECTIONS[0][d][1])
+            inside = (land_q >= 0) & (land_q < max_q) & (land_r >= 0) & (land_r < max_r)
+            land = numpy.where(inside, land_r * max_q + land_q, 0)
+            moved = numpy.nonzero(inside & enter[land])[0]
+            froms.append(moved)
+            lands.append(land[moved])
+        moves = sum(len(moved) for moved in froms)
+        # t3 pushes leave the multipliers as they are
+        counts = push_start[front + 1] - push_start[front]
+        pushed = numpy.repeat(numpy.arange(len(front)), counts)
+        firsts = numpy.repeat(push_start[front] - (numpy.cumsum(counts) - counts), counts)
+        froms.append(pushed)
+        lands.append(push_to[firsts + numpy.arange(len(pushed))])
+        froms = numpy.concatenate(froms)
+        lands = numpy.concatenate(lands)
+        offer_energy_mult = energy_mult[front][froms]
+        offer_step_mult = step_mult[front][froms]
+        offer_energy_mult[:moves] *= energy_factor[lands[:moves]]
+        offer_step_mult[:moves] *= step_factor[lands[:moves]]
+        offer_total = energy_new[froms] + step_new[froms]
+        offer_parent = front[froms]
+        settled[front] = True
+
+        # the best offer to each node not settled, kept when it beats the node's label
+        order = numpy.lexsort((offer_parent, offer_step_mult, offer_energy_mult, offer_total, lands))
+        order = order[~settled[lands[order]]]
+        first = numpy.ones(len(order), dtype=bool)
+        first[1:] = lands[order][1:] != lands[order][:-1]
+        order = order[first]
+        n = lands[order]
+        better = ((offer_total[order] < total[n])
+                  | ((offer_total[order] == total[n])
+                     & ((offer_energy_mult[order] < energy_mult[n])
+                        | ((offer_energy_mult[order] == energy_mult[n])
+                           & ((offer_step_mult[order] < step_mult[n])
+                              | ((offer_step_mult[order] == step_mult[n]) & (offer_parent[order] < parent[n])))))))
+        order, n = order[better], n[better]
+        energy[n] = energy_new[froms[order]]
+        step[n] = step_new[froms[order]]
+        total[n] = offer_total[order]
+        energy_mult[n] = offer_energy_mult[order]
+        step_mult[n] = offer_step_mult[order]
+        parent[n] = offer_parent[order]
+
+        for value in numpy.unique(total[n]).tolist():
+            if value not in fronts:
+                fronts[value] = []
+                heapq.heappush(costs, value)
+            fronts[value].append(n[total[n] == value])
+    return total.reshape(max_r, max_q)
+
+
+# no way to reach a node in an IncrementalPlanner
+UNREACHED = (INF,)
+
+
+# distance_field from one source that is kept between map changes and repaired instead of searched again
+# (lifelong planning A* without a heuristic)
+# each node holds a label (total, energy multiplier, step multiplier, parent, landing, energy, steps, t1, t2, r1, r2)
+# and labels compare in the order distance_field breaks ties, so the repaired field is the one distance_field returns
+# change the map through set_tile, or call update with the changed nodes after set_tile on compiled
+# the source is fixed, moving it changes every label as moves cost the multipliers picked up since the source
+class IncrementalPlanner:
+    def __init__(self, compiled, source, t1_effect=1.0, t2_effect=1.0, r1_effect=1.0, r2_effect=1.0):
+        self.compiled = compiled
+        self.source = compiled.max_q * source[1] + source[0]
+        size = compiled.max_q * compiled.max_r
+        # label of each node and the best label its predecessors offer, equal once the node is repaired
+        self.g = [UNREACHED] * size
+        self.rhs = [UNREACHED] * size
+        self.rhs[self.source] = (0.0, t1_effect * r1_effect, t2_effect * r2_effect, self.source, -1, 0.0, 0.0,
+                                 t1_effect, t2_effect, r1_effect, r2_effect)
+        # landing entries of the map the planner last saw, and the landing entries that end on each node
+        self.landing = compiled.landing[:]
+        self.preds = [[] for _ in range(size)]
+        for m in range(len(self.landing)):
+            if self.landing[m] >= 0:
+                self.preds[self.landing[m]].append(m)
+        # nodes whose label is not repaired yet, keyed by the smaller of g and rhs
+        self.open_list = []
+        self.queued = {}
+        self.expanded = 0
+        self.push(self.source)
+        self.repair()
+
+    # label a node gets moving in through landing entry m
+    def extend(self, m):
+        k = m // 2
+        u = k // 6
+        label = self.g[u]
+        if label is UNREACHED:
+            return UNREACHED
+        t1_effect, t2_effect, r1_effect, r2_effect = label[7:]
+        tile = self.compiled.tiles[self.compiled.neighbours[k]]
+        r1_effect_new, r2_effect_new = handle_reward(tile, r1_effect, r2_effect)
+        t1_effect_new, t2_effect_new = handle_trap_1_2(tile, t1_effect, t2_effect)
+        # every move costs the multipliers of the node it starts from
+        energy_new = label[5] + t1_effect * r1_effect
+        step_new = label[6] + t2_effect * r2_effect
+        return (energy_new + step_new, t1_effect_new * r1_effect_new, t2_effect_new * r2_effect_new, u, m,
+                energy_new, step_new, t1_effect_new, t2_effect_new, r1_effect_new, r2_effect_new)
+
+    # queue node n if its label is out of date
+    def push(self, n):
+        if self.g[n] == self.rhs[n]:
+            self.queued.pop(n, None)
+            return
+        key = min(self.g[n], self.rhs[n])
+        if self.queued.get(n) != key:
+            self.queued[n] = key
+            heapq.heappush(self.open_list, (key, n))
+
+    # recompute the best label the predecessors of node n offer
+    def update_node(self, n):
+        if n != self.source:
+            best = UNREACHED
+            for m in self.preds[n]:
+                label = self.extend(m)
+                if label < best:
+                    best = label
+            self.rhs[n] = best
+        self.push(n)
+
+    # settle the queued nodes in label order until every label is repaired
+    def repair(self):
+        while len(self.open_list) > 0:
+            key, n = heapq.heappop(self.open_list)
+            # skip entries replaced by a newer key
+            if self.queued.get(n) != key:
+                continue
+            del self.queued[n]
+            self.expanded += 1
+            if self.rhs[n] < self.g[n]:
+                self.g[n] = self.rhs[n]
+            else:
+                # the label got worse, drop it and let the predecessors offer a new one
+                self.g[n] = UNREACHED
+                self.update_node(n)
+            for m in range(n * 12, n * 12 + 12):
+                if self.landing[m] >= 0:
+                    self.update_node(self.landing[m])
+
+    # repair the field after set_tile changed nodes [q, r] on the compiled map
+    # only nodes up to three away can have other landing entries, so only their moves are looked at again
+    # returns how many nodes were settled
+    def update(self, changed):
+        compiled = self.compiled
+        near = set()
+        for (q, r) in changed:
+            for near_r in range(max(r - 3, 0), min(r + 4, compiled.max_r)):
+                for near_q in range(max(q - 3, 0), min(q + 4, compiled.max_q)):
+                    near.add(near_r * compiled.max_q + near_q)
+
+        expanded = self.expanded
+        touched = set()
+        for u in near:
+            for m in range(u * 12, u * 12 + 12):
+                old = self.landing[m]
+                new = compiled.landing[m]
+                if old >= 0:
+                    self.preds[old].remove(m)
+                    touched.add(old)
+                if new >= 0:
+                    self.preds[new].append(m)
+                    touched.add(new)
+                self.landing[m] = new
+        for n in touched:
+            self.update_node(n)
+        self.repair()
+        return self.expanded - expanded
+
+    # change node [q, r] on the compiled map and repair the field
+    def set_tile(self, q, r, name):
+        self.compiled.set_tile(q, r, name)
+        return self.update([(q, r)])
+
+    # cost of every node like distance_field, INF where it cannot be reached
+    def field(self):
+        return array("d", [label[0] for label in self.g])
+
+    # nodes [q, r] from the source to node [q, r], or None if it cannot be reached
+    def path(self, q, r):
+        n = r * self.compiled.max_q + q
+        if self.g[n] is UNREACHED:
+            return None
+        path = [(q, r)]
+        while n != self.source:
+            n = self.g[n][3]
+            path.append((n % self.compiled.max_q, n // self.compiled.max_q))
+        path.reverse()
+        return path
+
+    # leg to tsr in the same form as field_leg, or None if it cannot be reached
+    def leg(self, tsr):
+        path = self.path(tsr[0], tsr[1])
+        if path is None:
+            return None
+        label = self.g[tsr[1] * self.compiled.max_q + tsr[0]]
+        return (path, label[5], label[6], tuple(tsr)) + label[7:]
+
+
+# extend a tour label (energy, steps, t1, t2, r1, r2) by one leg
+# the multipliers at each step of a leg are the ones carried in times the ones picked up on the leg,
+# so the leg costs scale by the carried multipliers
+def extend_label(label, leg):
+    energy, steps, t1_effect, t2_effect, r1_effect, r2_effect = label
+    return (energy + leg[1] * t1_effect * r1_effect, steps + leg[2] * t2_effect * r2_effect,
+            t1_effect * leg[4], t2_effect * leg[5], r1_effect * leg[6], r2_effect * leg[7])
+
+
+# check if label a is no worse than label b in path cost and in both multipliers it carries forward
+def dominates(a, b):
+    return (a[0] + a[1] <= b[0] + b[1] and a[2] * a[4] <= b[2] * b[4]
+            and a[3] * a[5] <= b[3] * b[5])
+
+
+# keep only the entries whose label is not dominated by another one
+def add_label(entries, entry):
+    for other in entries:
+        if dominates(other[0], entry[0]):
+            return
+    entries[:] = [other for other in entries if not dominates(entry[0], other[0])]
+    entries.append(entry)
+
+
+# exact visiting order with Held-Karp dynamic programming over (visited treasures, last treasure)
+# each table entry keeps every label not dominated in cost and multipliers, since a dearer label can carry
+# cheaper multipliers into later legs
+def held_karp(legs, effects):
+    n = len(legs) - 1
+    # an entry is (label, previous entry, last treasure)
+    root = ((0.0, 0.0) + tuple(effects), None, 0)
+    if n == 0:
+        return [], root[0]
+    table = {}
+    for b in range(1, n + 1):
+        if legs[0][b] is not None:
+            table[(1 << (b - 1), b)] = [(extend_label(root[0], legs[0][b]), root, b)]
+
+    # every subset is finished before the larger subsets built from it
+    for mask in range(1, 1 << n):
+        for last in range(1, n + 1):
+            entries = table.get((mask, last))
+            if entries is None:
+                continue
+            for b in range(1, n + 1):
+                if mask & (1 << (b - 1)) or legs[last][b] is None:
+                    continue
+                bucket = table.setdefault((mask | (1 << (b - 1)), b), [])
+                for entry in entries:
+                    add_label(bucket, (extend_label(entry[0], legs[last][b]), entry, b))
+
+    # pick the cheapest complete tour
+    best = None
+    for last in range(1, n + 1):
+        for entry in table.get(((1 << n) - 1, last), []):
+            if best is None or tour_cost(entry[0]) < tour_cost(best[0]):
+                best = entry
+    if best is None:
+        return None
+
+    # walk back through the entries to recover the order
+    order = []
+    entry = best
+    while entry[1] is not None:
+        order.append(entry[2])
+        entry = entry[1]
+    order.reverse()
+    return order, best[0]
+
+
+# cost of visiting the treasures in this order, or None if a leg is unreachable
+def tour_label(legs, order, effects):
+    label = (0.0, 0.0) + tuple(effects)
+    prev = 0
+    for b in order:
+        if legs[prev][b] is None:
+            return None
+        label = extend_label(label, legs[prev][b])
+        prev = b
+    return label
+
+
+# compare tours by path cost, unreachable tours last
+def tour_cost(label):
+    return INF if label is None else label[0] + label[1]
+
+
+# orders one 2-opt or Or-opt move away from order
+def neighbour_orders(order):
+    n = len(order)
+    # 2-opt, reverse a segment
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            yield order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+    # Or-opt, move a segment of up to three treasures elsewhere
+    for length in range(1, 4):
+        for i in range(n - length + 1):
+            segment = order[i:i + length]
+            rest = order[:i] + order[i + length:]
+            for p in range(len(rest) + 1):
+                if p != i:
+                    yield rest[:p] + segment + rest[p:]
+
+
+# visiting order improved with 2-opt and Or-opt moves until no move helps or the time budget runs out
+def local_search(legs, effects, deadline):
+    n = len(legs) - 1
+
+    # start from the cheapest next leg at each point
+    order = []
+    label = (0.0, 0.0) + tuple(effects)
+    prev = 0
+    left = list(range(1, n + 1))
+    while len(left) > 0:
+        b = min(left, key=lambda b: tour_cost(None if legs[prev][b] is None else extend_label(label, legs[prev][b])))
+        if legs[prev][b] is None:
+            return None
+        label = extend_label(label, legs[prev][b])
+        order.append(b)
+        left.remove(b)
+        prev = b
+
+    best = tour_cost(tour_label(legs, order, effects))
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for candidate in neighbour_orders(order):
+            if time.perf_counter() >= deadline:
+                break
+            cost = tour_cost(tour_label(legs, candidate, effects))
+            if cost < best:
+                order, best = candidate, cost
+                improved = True
+                break
+
+    return order, tour_label(legs, order, effects)
+
+
+# plan the order to visit every treasure and the legs to get there
+# an order is costed by following it like main() does, searching its legs on a copy of the map so visited rewards
+# and traps are used up, as the cost_matrix legs leave that out and can rank the orders wrongly
+# up to ORDER_LIMIT treasures every order is tried with best_order, so the plan costs no more than any order
+# evaluate_orders scores, with more the order solved on the cost_matrix legs with trap and reward multipliers
+# carried between legs is followed, and the greedy order, and the cheaper one is improved with 2-opt and Or-opt
+# moves until no move helps or the time budget runs out
+# returns the order, the find_path result of each leg and the total energy consumed and steps taken,
+# or None if a treasure cannot be reached
+def plan_tour(map, start, treasures, t1_effect=1.0, t2_effect=1.0, r1_effect=1.0, r2_effect=1.0,
+              exact_limit=HELD_KARP_LIMIT, time_budget=1.0, state=None):
+    deadline = time.perf_counter() + time_budget
+    compiled = map.copy() if isinstance(map, CompiledMap) else CompiledMap([row[:] for row in map])
+    if state is None or not state.fits(compiled.max_q, compiled.max_r):
+        state = SearchState(compiled.max_q, compiled.max_r)
+    effects = (t1_effect, t2_effect, r1_effect, r2_effect)
+    treasures = [tuple(tsr) for tsr in treasures]
+
+    legs = cost_matrix(compiled, start, treasures, state)
+    if len(treasures) <= exact_limit:
+        solved = held_karp(legs, effects)
+    else:
+        solved = local_search(legs, effects, deadline)
+    if solved is None or solved[1] is None:
+        return None
+
+    best = None
+    for order in ([treasures[b - 1] for b in solved[0]], greedy_order(start, treasures)):
+        followed = follow_order(compiled.copy(), start, order, *effects, state)
+        if followed is not None and (best is None or followed[1] + followed[2] < best[2] + best[3]):
+            best = (order,) + followed
+    if len(treasures) <= ORDER_LIMIT:
+        return best_order(compiled, start, treasures, effects, state, best)
+
+    improved = best is not None
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for order in neighbour_orders(best[0]):
+            if time.perf_counter() >= deadline:
+                break
+            followed = follow_order(compiled.copy(), start, order, *effects, state)
+            if followed is not None and followed[1] + followed[2] < best[2] + best[3]:
+                best = (order,) + followed
+                improved = True
+                break
+    return best
+
+
+# cheapest order to visit treasures in when followed like follow_order does, trying every order
+# orders starting the same way share the legs searched for that start, and an order is dropped once its legs so
+# far cost at least as much as the cheapest whole order found, starting from best if given
+# returns the order, the find_path result of each leg and the total energy consumed and steps taken, the earliest
+# order found on a tie, or None if no order reaches every treasure
+def best_order(compiled, start, treasures, effects, state, best=None):
+    def visit(compiled, start, effects, left, order, results, total_e, total_s):
+        nonlocal best
+        if len(left) == 0:
+            if best is None or total_e + total_s < best[2] + best[3]:
+                best = (list(order), list(results), total_e, total_s)
+            return
+        for tsr in left:
+            result = find_path(start, tsr, compiled, *effects, state)
+            if result is None or (best is not None and total_e + total_s + result[1] + result[2] >= best[2] + best[3]):
+                continue
+            after = compiled.copy()
+            mark_path(result[0], after)
+            order.append(tsr)
+            results.append(result)
+            visit(after, result[3], result[4:8], [other for other in left if other != tsr], order, results,
+                  total_e + result[1], total_s + result[2])
+            order.pop()
+            results.pop()
+
+    visit(compiled, tuple(start), tuple(effects), [tuple(tsr) for tsr in treasures], [], [], 0, 0)
+    return best
+
+
+# search each leg of order in turn, carrying the multipliers and marking each path on compiled so visited rewards
+# and traps are used up
+# returns the find_path result of each leg and the total energy consumed and steps taken, or None if a treasure
+# cannot be reached
+def follow_order(compiled, start, order, t1_effect, t2_effect, r1_effect, r2_effect, state):
+    results = []
+    total_e = 0
+    total_s = 0
+    for tsr in order:
+        result = find_path(start, tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state)
+        if result is None:
+            return None
+        mark_path(result[0], compiled)
+        results.append(result)
+        total_e += result[1]
+        total_s += result[2]
+        start = result[3]
+        t1_effect, t2_effect, r1_effect, r2_effect = result[4:8]
+
+    return results, total_e, total_s
+
+
+# evaluate_orders scores every order of up to this many treasures and ORDER_SAMPLES random orders of more
+ORDER_LIMIT = 7
+ORDER_SAMPLES = 5040
+
+# pristine map, start node, multipliers and search state of an order scoring worker process, set by order_init
+scored_map = None
+scored_start = None
+scored_effects = None
+scored_state = None
+
+
+# worker process initializer, builds the map once from the node codes in the shared memory block name
+def order_init(name, max_q, max_r, start, effects):
+    global scored_map, scored_start, scored_effects, scored_state
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        scored_map = CompiledMap.from_tiles(bytes(block.buf[:max_q * max_r]), max_q)
+    finally:
+        block.close()
+    scored_start = start
+    scored_effects = effects
+    scored_state = SearchState(scored_map.max_q, scored_map.max_r)
+
+
+# worker process entry point, follows each (index, order) pair on a fresh copy of the map and returns the
+# (path cost, index) of the cheapest order of the chunk
+def score_orders(chunk):
+    best = (INF, -1)
+    for (index, order) in chunk:
+        followed = follow_order(scored_map.copy(), scored_start, order, *scored_effects, scored_state)
+        if followed is not None:
+            best = min(best, (followed[1] + followed[2], index))
+    return best
+
+
+# treasures in the order hunt visits them with the greedy planner, the closest one next by Euclidean distance
+def greedy_order(start, treasures):
+    order = []
+    left = [tuple(tsr) for tsr in treasures]
+    q, r = start
+    while len(left) > 0:
+        tsr = prioritise_treasure(q, r, left)
+        left.remove(tsr)
+        order.append(tsr)
+        q, r = tsr
+    return order
+
+
+# score visiting orders of treasures by following their legs like hunt does, across worker processes
+# the map is put in shared memory once and each worker builds its CompiledMap from it once, a task only carries
+# orders, chunk_size of them
+# orders defaults to every order of treasures, or to ORDER_SAMPLES random ones from seed and the greedy order when
+# there are more than ORDER_LIMIT treasures
+# returns the cheapest order and its path cost, the earliest one on a tie, or None if no order reaches every treasure
+def evaluate_orders(map, start, treasures, t1_effect=1.0, t2_effect=1.0, r1_effect=1.0, r2_effect=1.0,
+                    orders=None, workers=None, chunk_size=64, seed=0):
+    compiled = map if isinstance(map, CompiledMap) else CompiledMap(map)
+    treasures = [tuple(tsr) for tsr in treasures]
+    if orders is None:
+        if len(treasures) <= ORDER_LIMIT:
+            orders = list(itertools.permutations(treasures))
+        else:
+            rng = random.Random(seed)
+            orders = [greedy_order(start, treasures)]
+            orders += [rng.sample(treasures, len(treasures)) for _ in range(ORDER_SAMPLES - 1)]
+    orders = [[tuple(tsr) for tsr in order] for order in orders]
+    if len(orders) == 0:
+        return None
+    numbered = list(enumerate(orders))
+    chunks = [numbered[i:i + chunk_size] for i in range(0, len(numbered), chunk_size)]
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(compiled.tiles)))
+    try:
+        block.buf[:len(compiled.tiles)] = compiled.tiles
+        effects = (t1_effect, t2_effect, r1_effect, r2_effect)
+        with ProcessPoolExecutor(workers or os.cpu_count() or 1, initializer=order_init,
+                                 initargs=(block.name, compiled.max_q, compiled.max_r, tuple(start), effects)) as pool:
+            cost, index = min(pool.map(score_orders, chunks))
+    finally:
+        block.close()
+        block.unlink()
+    if cost == INF:
+        return None
+    return list(orders[index]), cost
+
+
+# collect every treasure from start like main() does, without printing
+# planner is "greedy" to visit the closest treasure next, "optimal" to follow plan_tour or "parallel" to follow the
+# cheapest order evaluate_orders finds
+# map is left unchanged unless apply is set, cache is a PathCache shared by the legs and by replays of the hunt
+# clusters is a ClusterMap built for map to search each leg hierarchically, heuristic and stats are passed on to solve
+# budget is the seconds the anytime searches of all legs share, each leg gets an even part of what is left, and
+# epsilon is passed on to solve, either one makes every leg an anytime search
+# returns the order the treasures were visited in, the SearchResult of each leg and the total energy consumed and
+# steps taken, or None if a treasure cannot be reached
+# raises ValueError if start is off the map or blocked, even with no treasures to collect
+def hunt(map, start, treasures, t1_effect=1.0, t2_effect=1.0, r1_effect=1.0, r2_effect=1.0, planner="greedy",
+         effect_aware=False, queue="heap", time_budget=1.0, state=None, apply=False, cache=None, clusters=None,
+         heuristic="euclidean", stats=None, budget=None, epsilon=None):
+    if isinstance(map, CompiledMap):
+        compiled = map if apply else map.copy()
+    else:
+        compiled = CompiledMap(map if apply else [row[:] for row in map])
+    if not compiled.is_open(*start):
+        raise ValueError("start " + str(list(start)) + " is off the map or blocked")
+    if state is None or not state.fits(compiled.max_q, compiled.max_r):
+        state = SearchState(compiled.max_q, compiled.max_r) if clusters is None else \
+            SparseState(compiled.max_q, compiled.max_r)
+    treasures = [tuple(tsr) for tsr in treasures]
+
+    if planner == "optimal":
+        # planning sweeps the whole map, which a SparseState would hold in dicts
+        plan = plan_tour(compiled, start, treasures, t1_effect, t2_effect, r1_effect, r2_effect,
+                         time_budget=time_budget, state=None if isinstance(state, SparseState) else state)
+        if plan is None:
+            return None
+        treasures = list(plan[0])
+    elif planner == "parallel":
+        best = evaluate_orders(compiled, start, treasures, t1_effect, t2_effect, r1_effect, r2_effect)
+        if best is None:
+            return None
+        treasures = best[0]
+    elif planner != "greedy":
+        raise ValueError("unknown planner " + repr(planner) + ", expected greedy, optimal or parallel")
+
+    order = []
+    results = []
+    total_e = 0
+    total_s = 0
+    deadline = None if budget is None else time.perf_counter() + budget
+    while len(treasures) > 0:
+        # follow the planned order or find the next closest treasure
+        if planner != "greedy":
+            closest_tsr = treasures[0]
+        else:
+            closest_tsr = prioritise_treasure(start[0], start[1], treasures)
+        leg_budget = None
+        if deadline is not None:
+            leg_budget = max(0.0, deadline - time.perf_counter()) / len(treasures)
+        result = solve(compiled, start, closest_tsr, t1_effect, t2_effect, r1_effect, r2_effect, state,
+                       effect_aware, queue, apply=True, cache=cache, clusters=clusters, heuristic=heuristic,
+                       stats=stats, budget=leg_budget, epsilon=epsilon)
+        if result is None:
+            return None
+        treasures.remove(closest_tsr)
+        order.append(closest_tsr)
+        results.append(result)
+        total_e += result.energy
+        total_s += result.steps
+        start = result.end
+        t1_effect, t2_effect, r1_effect, r2_effect = result.effects
+
+    return order, results, total_e, total_s
+
+
+# solve one batch instance, a dict with "map", "start" and "treasures" and optionally "id", "effects" as
+# [t1, t2, r1, r2], "planner" and "effect_aware"
+# returns a dict ready to be written as a JSON line, with "error" set instead of a result if it failed
+# with stats set the SearchStats of its searches are given as "stats"
+def solve_instance(instance, planner="greedy", effect_aware=False, stats=False):
+    search_stats = SearchStats() if stats else None
+    effects = instance.get("effects", (1.0, 1.0, 1.0, 1.0))
+    try:
+        if not isinstance(effects, (list, tuple)) or len(effects) != 4:
+            raise ValueError("effects must be [t1, t2, r1, r2], got " + str(effects))
+        found = hunt(instance["map"], tuple(instance["start"]), instance["treasures"], *effects,
+                     planner=instance.get("planner", planner),
+                     effect_aware=instance.get("effect_aware", effect_aware), stats=search_stats)
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        return {"id": instance.get("id"), "error": type(e).__name__ + ": " + str(e)}
+    if found is None:
+        failed = {"id": instance.get("id"), "error": "a treasure cannot be reached"}
+        if stats:
+            failed["stats"] = search_stats.as_dict()
+        return failed
+
+    order, results, total_e, total_s = found
+    # join the legs into one path, each leg starts where the last one ended
+    path = list(results[0].path) if len(results) > 0 else [tuple(instance["start"])]
+    for result in results[1:]:
+        path.extend(result.path[1:])
+    solved = {"id": instance.get("id"), "order": order, "path": path, "energy": total_e, "steps": total_s,
+              "cost": total_e + total_s, "effects": results[-1].effects if len(results) > 0 else tuple(effects)}
+    if stats:
+        solved["stats"] = search_stats.as_dict()
+    return solved
+
+
+# worker process entry point, solves a chunk of (line number, JSON line) pairs
+def solve_chunk(chunk, planner, effect_aware, stats=False):
+    solved = []
+    for (line_no, line) in chunk:
+        try:
+            instance = json.loads(line)
+        except ValueError as e:
+            solved.append((line_no, {"id": None, "error": "line " + str(line_no) + ": " + str(e)}))
+            continue
+        if not isinstance(instance, dict):
+            solved.append((line_no, {"id": None, "error": "line " + str(line_no) + ": expected a JSON object"}))
+            continue
+        solved.append((line_no, solve_instance(instance, planner, effect_aware, stats)))
+    return solved
+
+
+# group the non-blank lines of a JSONL stream into chunks of (line number, line) without reading ahead
+def read_chunks(lines, chunk_size):
+    chunk = []
+    for line_no, line in enumerate(lines, 1):
+        if line.strip() == "":
+            continue
+        chunk.append((line_no, line))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+# solve the instances in a JSONL stream across worker processes and yield a result dict per instance
+# at most max_pending chunks are read ahead of the results given back, so memory stays bounded however long the
+# stream is, ordered gives the results in input order instead of as they complete
+def batch_solve(lines, workers=None, chunk_size=16, ordered=True, max_pending=None, planner="greedy",
+                effect_aware=False, stats=False):
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    chunks = read_chunks(lines, chunk_size)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+
+        # keep the pool fed up to max_pending chunks
+        def fill():
+            while len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                pending.append(pool.submit(solve_chunk, chunk, planner, effect_aware, stats))
+
+        fill()
+        while len(pending) > 0:
+            if ordered:
+                future = pending.popleft()
+            else:
+                future = next(iter(wait(pending, return_when=FIRST_COMPLETED)[0]))
+                pending.remove(future)
+            for (line_no, result) in future.result():
+                yield result
+            fill()
+
+
+# batch command, read instances from a JSONL file or stdin and write a JSON line per result
+def run_batch(args):
+    source = sys.stdin if args.input == "-" else open(args.input)
+    target = sys.stdout if args.output == "-" else open(args.output, "w")
+    began = time.perf_counter()
+    count = 0
+    failed = 0
+    search_stats = SearchStats()
+    try:
+        for result in batch_solve(source, args.workers, args.chunk_size, not args.unordered,
+                                  planner=args.planner, effect_aware=args.effect_aware, stats=args.stats):
+            target.write(json.dumps(result) + "\n")
+            count += 1
+            if "error" in result:
+                failed += 1
+            if "stats" in result:
+                search_stats.add(result["stats"])
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    elapsed = time.perf_counter() - began
+    print("Solved " + str(count) + " instances (" + str(failed) + " failed) in " + format(elapsed, ".2f") + "s, "
+          + format(count / elapsed if elapsed > 0 else 0.0, ".1f") + " instances/s", file=sys.stderr)
+    if args.stats:
+        print("Search stats:", search_stats.to_json(), file=sys.stderr)
+
+
+# queries a QueryService takes in at a time and seconds each one may take to be answered unless told otherwise
+SERVICE_PENDING = 64
+SERVICE_TIMEOUT = 5.0
+
+# part of the time left before the timeout that a search which can stop early is given, the rest is for sending
+# its answer back
+SERVICE_MARGIN = 0.8
+
+# latencies of the last SERVICE_WINDOW queries are kept for the percentiles
+SERVICE_WINDOW = 10000
+SERVICE_PERCENTILES = (50, 90, 99)
+
+# frozen map, search state and cache of a service worker process, set once by serve_init
+served_map = None
+served_state = None
+served_cache = None
+
+
+# worker process initializer, keeps the map every query of the service is searched on
+def serve_init(compiled):
+    global served_map, served_state, served_cache
+    served_map = compiled.freeze()
+    served_state = SearchState(compiled.max_q, compiled.max_r)
+    served_cache = PathCache()
+
+
+# True if value is a JSON number, bools are not taken as numbers
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# node of a service query field as (q, r), raising ValueError unless it is a list of two integers
+def query_node(query, field):
+    node = query.get(field)
+    if not isinstance(node, (list, tuple)) or len(node) != 2 or not all(
+            isinstance(v, int) and not isinstance(v, bool) for v in node):
+        raise ValueError("expected " + field + " as [q, r] integers, got " + json.dumps(node))
+    return tuple(node)
+
+
+# key of a service query, a dict with "start" and "treasure" and optionally "effects" as [t1, t2, r1, r2],
+# "heuristic", "effect_aware", "budget" and "epsilon", queries with the same key get the same answer
+# raises ValueError on a field of the wrong type, so every key can be hashed
+def query_key(query):
+    effects = query.get("effects", (1.0, 1.0, 1.0, 1.0))
+    if not isinstance(effects, (list, tuple)) or len(effects) != 4 or not all(is_number(v) for v in effects):
+        raise ValueError("expected effects as [t1, t2, r1, r2] numbers, got " + json.dumps(effects))
+    heuristic = query.get("heuristic", "euclidean")
+    if not isinstance(heuristic, str):
+        raise ValueError("expected heuristic as a name, got " + json.dumps(heuristic))
+    effect_aware = query.get("effect_aware", False)
+    if not isinstance(effect_aware, bool):
+        raise ValueError("expected effect_aware as true or false, got " + json.dumps(effect_aware))
+    for field in ("budget", "epsilon"):
+        if query.get(field) is not None and not is_number(query[field]):
+            raise ValueError("expected " + field + " as a number, got " + json.dumps(query[field]))
+    return (query_node(query, "start"), query_node(query, "treasure"), tuple(float(v) for v in effects), heuristic,
+            effect_aware, query.get("budget"), query.get("epsilon"))
+
+
+# worker process entry point, answers the query with this key on the served map
+# a deadline in time.time() seconds caps the budget of a search that takes one, so it ends before the query times out
+def serve_query(key, deadline=None):
+    start, treasure, effects, heuristic, effect_aware, budget, epsilon = key
+    if deadline is not None and (effect_aware or budget is not None or epsilon is not None):
+        left = max(0.0, deadline - time.time())
+        budget = left if budget is None else min(budget, left)
+    try:
+        result = solve(served_map, start, treasure, *effects, state=served_state, effect_aware=effect_aware,
+                       cache=served_cache, heuristic=heuristic, budget=budget, epsilon=epsilon)
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        return {"error": type(e).__name__ + ": " + str(e)}
+    if result is None:
+        return {"error": "the treasure cannot be reached"}
+    return {"path": result.path, "energy": result.energy, "steps": result.steps, "cost": result.cost,
+            "end": result.end, "effects": result.effects, "expanded": result.expanded, "bound": result.bound}
+
+
+# value below which p percent of the sorted values fall, 0.0 if there are none
+def percentile(ordered, p):
+    if len(ordered) == 0:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, -(-p * len(ordered) // 100) - 1))]
+
+
+# answers path queries on one frozen map from asyncio, searching them in worker processes
+# at most max_pending queries are taken in at a time, submit waits for room so a reader stops reading while the
+# workers are behind
+# identical queries asked while one is being searched share its answer, a query not answered within timeout
+# seconds gets an error and its search is dropped if it has not started and no other query waits for it
+# effect aware and anytime searches are given the time left as their budget, a plain search runs to its end
+class QueryService:
+    def __init__(self, compiled, workers=None, max_pending=SERVICE_PENDING, timeout=SERVICE_TIMEOUT):
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1, got " + str(max_pending))
+        self.compiled = compiled.freeze()
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pool = None
+        self.slots = asyncio.Semaphore(max_pending)
+        self.pending = 0
+        # search in flight for each query key and how many queries wait for it
+        self.inflight = {}
+        self.waiting = collections.Counter()
+        self.latencies = collections.deque(maxlen=SERVICE_WINDOW)
+        self.answered = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.failed = 0
+
+    # start the worker processes, each gets the map once
+    def start(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=serve_init, initargs=(self.compiled,))
+            # have the processes forked now, a process forked later keeps any client socket open then alive
+            self.pool.submit(os.getpid).result()
+        return self
+
+    # stop the worker processes, dropping the searches not started yet
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    # wait for room, then start answering query and return the task giving its answer
+    async def submit(self, query):
+        await self.slots.acquire()
+        self.pending += 1
+        return asyncio.ensure_future(self.answer(query, time.perf_counter()))
+
+    # answer query, a dict ready to be written as a JSON line with "error" set if it failed or timed out
+    async def query(self, query):
+        return await (await self.submit(query))
+
+    async def answer(self, query, began):
+        try:
+            answer = await self.search(query, began)
+        except Exception as e:
+            answer = {"id": query.get("id"), "error": type(e).__name__ + ": " + str(e)}
+        finally:
+            self.pending -= 1
+            self.slots.release()
+        self.latencies.append(time.perf_counter() - began)
+        self.answered += 1
+        if "error" in answer:
+            self.failed += 1
+        return answer
+
+    async def search(self, query, began):
+        try:
+            key = query_key(query)
+        except (KeyError, TypeError, ValueError) as e:
+            return {"id": query.get("id"), "error": type(e).__name__ + ": " + str(e)}
+
+        search = self.inflight.get(key)
+        if search is None:
+            # searches that can stop early stop a little before the timeout, so they do not keep a worker busy
+            deadline = None
+            if self.timeout is not None:
+                deadline = time.time() + (self.timeout - (time.perf_counter() - began)) * SERVICE_MARGIN
+            search = asyncio.get_running_loop().run_in_executor(self.pool, serve_query, key, deadline)
+            self.inflight[key] = search
+            search.add_done_callback(lambda done: self.forget(key, done))
+        else:
+            self.coalesced += 1
+        self.waiting[key] += 1
+        try:
+            left = None if self.timeout is None else max(0.0, self.timeout - (time.perf_counter() - began))
+            found = await asyncio.wait_for(asyncio.shield(search), left)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return {"id": query.get("id"), "error": "timed out after " + str(self.timeout) + "s"}
+        finally:
+            self.waiting[key] -= 1
+            if self.waiting[key] == 0:
+                del self.waiting[key]
+                if not search.done():
+                    search.cancel()
+        return dict(id=query.get("id"), **found)
+
+    # drop a finished search unless a newer one for the same key took its place
+    def forget(self, key, search):
+        if self.inflight.get(key) is search:
+            del self.inflight[key]
+
+    # answer the JSON lines given by the coroutine function readline until it gives b"", calling write with each
+    # answer as soon as it is ready, so answers can come back in another order than the queries
+    async def serve_lines(self, readline, write):
+        answering = set()
+
+        def done(task):
+            answering.discard(task)
+            write(task.result())
+
+        line_no = 0
+        while True:
+            line = await readline()
+            if not line:
+                break
+            line_no += 1
+            if line.strip() == b"":
+                continue
+            try:
+                query = json.loads(line)
+            except ValueError as e:
+                write({"id": None, "error": "line " + str(line_no) + ": " + str(e)})
+                continue
+            if not isinstance(query, dict):
+                write({"id": None, "error": "line " + str(line_no) + ": expected a JSON object"})
+                continue
+            task = await self.submit(query)
+            answering.add(task)
+            task.add_done_callback(done)
+        if len(answering) > 0:
+            await asyncio.wait(answering)
+
+    # queries answered, how many shared a search or timed out and the latency percentiles in milliseconds
+    def stats(self):
+        ordered = sorted(self.latencies)
+        stats = {"answered": self.answered, "coalesced": self.coalesced, "timeouts": self.timeouts,
+                 "failed": self.failed, "pending": self.pending}
+        for p in SERVICE_PERCENTILES:
+            stats["p" + str(p) + "_ms"] = percentile(ordered, p) * 1000
+        stats["max_ms"] = ordered[-1] * 1000 if len(ordered) > 0 else 0.0
+        return stats
+
+
+# answer JSON line queries from stdin on stdout, or from every client connecting to port on localhost
+async def serve(service, port=None):
+    service.start()
+    try:
+        if port is None:
+            loop = asyncio.get_running_loop()
+
+            def write(answer):
+                sys.stdout.write(json.dumps(answer) + "\n")
+                sys.stdout.flush()
+
+            # stdin can be a file, which the event loop cannot watch, so read it in a thread
+            await service.serve_lines(lambda: loop.run_in_executor(None, sys.stdin.buffer.readline), write)
+        else:
+            async def client(reader, writer):
+                await service.serve_lines(reader.readline,
+                                          lambda answer: writer.write(json.dumps(answer).encode() + b"\n"))
+                await writer.drain()
+                writer.close()
+
+            server = await asyncio.start_server(client, "127.0.0.1", port)
+            async with server:
+                await server.serve_forever()
+    finally:
+        service.close()
+
+
+# serve command, load the map and answer queries until stdin ends or the server is stopped
+def run_serve(args):
+    with open(args.map) as source:
+        loaded = json.load(source)
+    compiled = CompiledMap(loaded["map"] if isinstance(loaded, dict) else loaded)
+    service = QueryService(compiled, args.workers, args.max_pending, args.timeout)
+    try:
+        asyncio.run(serve(service, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Latency:", json.dumps(service.stats()), file=sys.stderr)
+
+
+# random map of max_q by max_r nodes from seed, with each density the share of nodes given that kind of node
+# obstacles are split between "o" and "t4", traps between "t1", "t2" and "t3" and rewards between "r1" and "r2"
+# returns the map with the player on it, the start node and the treasure nodes
+def generate_map(seed, max_q=10, max_r=6, obstacles=0.15, traps=0.05, rewards=0.03, treasures=4):
+    rng = random.Random(seed)
+    size = max_q * max_r
+    kinds = []
+    for (density, names) in ((obstacles, ["o", "t4"]), (traps, ["t1", "t2", "t3"]), (rewards, ["r1", "r2"])):
+        kinds += [names[i % len(names)] for i in range(int(density * size))]
+    if len(kinds) + treasures + 1 > size:
+        raise ValueError("a " + str(max_q) + "x" + str(max_r) + " map has no room for " + str(len(kinds)) +
+                         " obstacles, traps and rewards, " + str(treasures) + " treasures and the player")
+
+    map = [[" "] * max_q for _ in range(max_r)]
+    nodes = rng.sample(range(size), len(kinds) + treasures + 1)
+    for (n, name) in zip(nodes, kinds):
+        map[n // max_q][n % max_q] = name
+    placed = [(n % max_q, n // max_q) for n in nodes[len(kinds):]]
+    start = placed[0]
+    map[start[1]][start[0]] = "p"
+    for (q, r) in placed[1:]:
+        map[r][q] = "g"
+    return map, start, placed[1:]
+
+
+# maps the bench command runs unless given a size, a case is a name and the generate_map arguments
+BENCH_CASES = [
+    {"name": "small-10x6", "seed": 1, "max_q": 10, "max_r": 6},
+    {"name": "open-64x64", "seed": 2, "max_q": 64, "max_r": 64, "obstacles": 0.05},
+    {"name": "dense-64x64", "seed": 3, "max_q": 64, "max_r": 64, "obstacles": 0.3},
+    {"name": "traps-128x128", "seed": 4, "max_q": 128, "max_r": 128, "traps": 0.15, "rewards": 0.1},
+    {"name": "open-256x256", "seed": 5, "max_q": 256, "max_r": 256, "treasures": 8},
+]
+
+# report fields that only change when the search does, any increase of them is a regression
+BENCH_EXACT = ("expanded", "pushes", "cost")
+
+# seconds a time may grow by before the tolerance applies, shorter times are mostly timer noise
+BENCH_NOISE = 0.005
+
+# relative difference wavefront_field may have from distance_field, see there
+BENCH_FIELD_ERROR = 1e-12
+
+
+# time one search to the closest treasure, the whole treasure loop and the cost field of the whole map from the start
+# on the map of case, best of repeat runs, the field with distance_field and with wavefront_field when numpy is there
+# peak memory is measured on a separate run as tracing slows the search down
+def bench_case(case, repeat=1):
+    params = {key: value for key, value in case.items() if key != "name"}
+    map, start, treasures = generate_map(**params)
+    report = {"name": case.get("name", "custom"), "params": params}
+
+    began = time.perf_counter()
+    compiled = CompiledMap(map)
+    report["compile_s"] = time.perf_counter() - began
+    state = SearchState(compiled.max_q, compiled.max_r)
+    closest_tsr = prioritise_treasure(start[0], start[1], treasures)
+
+    for _ in range(repeat):
+        open_list = HeapQueue()
+        began = time.perf_counter()
+        result = solve(compiled, start, closest_tsr, state=state, queue=open_list)
+        elapsed = time.perf_counter() - began
+        if "search" not in report or elapsed < report["search"]["time_s"]:
+            report["search"] = {"time_s": elapsed, "found": result is not None,
+                                "expanded": state.expanded, "pushes": open_list.stats()["pushes"],
+                                "cost": result.cost if result is not None else None}
+
+        open_list = HeapQueue()
+        began = time.perf_counter()
+        found = hunt(compiled, start, treasures, state=state, queue=open_list)
+        elapsed = time.perf_counter() - began
+        if "hunt" not in report or elapsed < report["hunt"]["time_s"]:
+            report["hunt"] = {"time_s": elapsed, "found": found is not None,
+                              "expanded": sum(leg.expanded for leg in found[1]) if found is not None else None,
+                              "pushes": open_list.stats()["pushes"],
+                              "cost": found[2] + found[3] if found is not None else None}
+
+        began = time.perf_counter()
+        field = distance_field(start, compiled, 1.0, 1.0, 1.0, 1.0, state)
+        elapsed = time.perf_counter() - began
+        if "field" not in report or elapsed < report["field"]["time_s"]:
+            report["field"] = dict(report.get("field", {}), time_s=elapsed)
+        if numpy is not None:
+            began = time.perf_counter()
+            wavefront = wavefront_field(start, compiled).ravel()
+            elapsed = time.perf_counter() - began
+            if "wavefront_s" not in report["field"] or elapsed < report["field"]["wavefront_s"]:
+                # largest difference from distance_field relative to the cost, infinite if they reach other nodes
+                field = numpy.frombuffer(field, dtype=numpy.float64)
+                reached = numpy.isfinite(field)
+                error = INF
+                if numpy.array_equal(reached, numpy.isfinite(wavefront)):
+                    error = float((numpy.abs(wavefront[reached] - field[reached])
+                                   / numpy.maximum(field[reached], 1.0)).max(initial=0.0))
+                report["field"]["wavefront_s"] = elapsed
+                report["field"]["max_error"] = error
+
+    tracemalloc.start()
+    try:
+        hunt(CompiledMap(map), start, treasures)
+        report["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return report
+
+
+# compare a bench report with a baseline report case by case
+# returns a line per regression or case missing from the baseline and the number of regressions, times and memory
+# regress when they grow by more than tolerance, the other metrics whenever they grow
+def compare_reports(report, baseline, tolerance=0.5):
+    lines = []
+    regressions = 0
+    old_cases = {case["name"]: case for case in baseline["cases"]}
+    for case in report["cases"]:
+        old_case = old_cases.get(case["name"])
+        if old_case is None:
+            lines.append(case["name"] + ": not in the baseline")
+            continue
+        metrics = [("compile_s", case["compile_s"], old_case["compile_s"]),
+                   ("peak_bytes", case["peak_bytes"], old_case["peak_bytes"])]
+        for part in ("search", "hunt"):
+            for key in ("time_s",) + BENCH_EXACT:
+                metrics.append((part + "." + key, case[part][key], old_case[part][key]))
+        for key in ("time_s", "wavefront_s"):
+            if key in case.get("field", {}) and key in old_case.get("field", {}):
+                metrics.append(("field." + key, case["field"][key], old_case["field"][key]))
+        if case.get("field", {}).get("max_error", 0.0) > BENCH_FIELD_ERROR:
+            regressions += 1
+            lines.append(case["name"] + " wavefront_field differs from distance_field by "
+                         + str(case["field"]["max_error"]))
+        for (metric, new, old) in metrics:
+            if new is None or old is None:
+                worse = new != old
+            elif metric.split(".")[-1] in BENCH_EXACT:
+                worse = new > old
+            elif metric.endswith("_s"):
+                worse = new > old * (1 + tolerance) and new - old > BENCH_NOISE
+            else:
+                worse = new > old * (1 + tolerance)
+            if worse:
+                regressions += 1
+                lines.append(case["name"] + " " + metric + " regressed: " + str(old) + " -> " + str(new))
+    return lines, regressions
+
+
+# bench command, run the bench cases or one map of the given size and write a JSON report
+def run_bench(args):
+    if args.size is not None:
+        max_q, max_r = (int(side) for side in args.size.lower().split("x"))
+        cases = [{"name": args.size, "seed": args.seed, "max_q": max_q, "max_r": max_r, "obstacles": args.obstacles,
+                  "traps": args.traps, "rewards": args.rewards, "treasures": args.treasures}]
+    else:
+        cases = BENCH_CASES
+
+    report = {"python": sys.version.split()[0], "repeat": args.repeat, "cases": []}
+    for case in cases:
+        report["cases"].append(bench_case(case, args.repeat))
+        print("Benchmarked " + report["cases"][-1]["name"], file=sys.stderr)
+
+    if args.output == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressions = compare_reports(report, baseline, args.tolerance)
+        for line in lines:
+            print(line, file=sys.stderr)
+        print(str(regressions) + " regressions against " + args.compare, file=sys.stderr)
+        if regressions > 0:
+            sys.exit(1)
+
+
+# the map the game is played on unless told otherwise, with its start node and treasure nodes, a new copy each call
+def game_map():
+    # define the map
+    # alphanumeric characters to represent nodes with reward, trap, treasure and obstacle
+    # p - represent player location
+    # g - represent treasure nodes
+    # o - represent obstacle nodes
+    # r1, r2 - represent reward nodes
+    # t1, t2, t3, t4 - represent trap nodes
+    # " " - represent empty nodes
+    map = [
+        ["p", " ", " ", " ", "r1", " ", " ", " ", " ", " "],
+        [" ", "t2", " ", "t4", "g", " ", "t3", " ", "o", " "],
+        [" ", " ", "o", " ", "o", " ", " ", "r2", "t1", " "],
+        ["o", "r1", " ", "o", " ", "t3", "o", "g", " ", "g"],
+        [" ", " ", "t2", "g", "o", " ", "o", "o", " ", " "],
+        [" ", " ", " ", " ", " ", "r2", " ", " ", " ", " "]
+    ]
+
+    # define start node [q, r]
+    start = (0, 0)
+
+    # define list of treasure nodes [q, r]
+    treasures = [(3, 4), (4, 1), (7, 3), (9, 3)]
+    return map, start, treasures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect all the treasures using the least energy and steps.")
+    parser.add_argument("--planner", choices=["greedy", "optimal", "parallel"], default="greedy",
+                        help="visit the closest treasure next, plan the whole visiting order up front, or score "
+                             "many visiting orders across worker processes")
+    parser.add_argument("--time-budget", type=float, default=1.0,
+                        help="seconds the optimal planner may spend improving a large tour")
+    parser.add_argument("--effect-aware", action="store_true",
+                        help="search (node, trap and reward effects) states for the cheapest path to each treasure")
+    parser.add_argument("--queue", choices=sorted(OPEN_LISTS),
+                        help="open list engine for the search, prints its counters at the end")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS),
+                        help="estimate of the cost left for the search, prints the nodes expanded at the end")
+    parser.add_argument("--stats", action="store_true", help="print the search stats as JSON at the end")
+    parser.add_argument("--map", help="map file to play instead of the built-in map, text or binary, see save_map")
+    parser.add_argument("--budget", type=float,
+                        help="seconds an anytime search may spend improving the path to each treasure")
+    parser.add_argument("--epsilon", type=float,
+                        help="stop improving a path once it costs at most this many times the cheapest")
+    parser.add_argument("--viewport", type=int, metavar="MARGIN",
+                        help="draw the initial and final maps only this many nodes around the final path")
+    parser.add_argument("--path-code", action="store_true",
+                        help="also print the final path as a compact direction code, see encode_path")
+    commands = parser.add_subparsers(dest="command")
+
+    batch_parser = commands.add_parser("batch", help="solve many maps from a JSONL file across worker processes")
+    batch_parser.add_argument("input", nargs="?", default="-",
+                              help="JSONL file of instances with map, start and treasures, - for stdin")
+    batch_parser.add_argument("-o", "--output", default="-", help="file to write JSONL results to, - for stdout")
+    batch_parser.add_argument("--workers", type=int, help="worker processes, defaults to the number of CPUs")
+    batch_parser.add_argument("--chunk-size", type=int, default=16, help="instances sent to a worker at a time")
+    batch_parser.add_argument("--unordered", action="store_true",
+                              help="write results as they complete instead of in input order")
+    batch_parser.add_argument("--planner", choices=["greedy", "optimal"], default="greedy",
+                              help="planner for instances that do not set one")
+    batch_parser.add_argument("--effect-aware", action="store_true",
+                              help="effect-aware search for instances that do not set effect_aware")
+    batch_parser.add_argument("--stats", action="store_true",
+                              help="add the search stats to each result and print their totals at the end")
+
+    bench_parser = commands.add_parser("bench", help="time the search on generated maps and write a JSON report")
+    bench_parser.add_argument("-o", "--output", default="-", help="file to write the report to, - for stdout")
+    bench_parser.add_argument("--compare", help="baseline report to compare with, exits with 1 on a regression")
+    bench_parser.add_argument("--tolerance", type=float, default=0.5,
+                              help="share a time or memory may grow by before it counts as a regression")
+    bench_parser.add_argument("--repeat", type=int, default=3, help="runs per map, the fastest one is reported")
+    bench_parser.add_argument("--size", help="run one map of this size, such as 4096x4096, instead of the cases")
+    bench_parser.add_argument("--seed", type=int, default=0, help="seed of the map generated for --size")
+    bench_parser.add_argument("--obstacles", type=float, default=0.15, help="share of obstacle and t4 nodes")
+    bench_parser.add_argument("--traps", type=float, default=0.05, help="share of t1, t2 and t3 nodes")
+    bench_parser.add_argument("--rewards", type=float, default=0.03, help="share of r1 and r2 nodes")
+    bench_parser.add_argument("--treasures", type=int, default=4, help="treasures on the map")
+
+    serve_parser = commands.add_parser("serve", help="answer JSONL path queries on one map from worker processes")
+    serve_parser.add_argument("map", help="JSON file with the map, as a list of rows or an object with \"map\"")
+    serve_parser.add_argument("--port", type=int, help="listen on this localhost port instead of stdin and stdout")
+    serve_parser.add_argument("--workers", type=int, help="worker processes, defaults to the number of CPUs")
+    serve_parser.add_argument("--max-pending", type=int, default=SERVICE_PENDING,
+                              help="queries taken in at a time, reading stops while this many wait")
+    serve_parser.add_argument("--timeout", type=float, default=SERVICE_TIMEOUT,
+                              help="seconds a query may take before it is answered with an error")
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        run_batch(args)
+        return
+    if args.command == "bench":
+        run_bench(args)
+        return
+    if args.command == "serve":
+        run_serve(args)
+        return
+
+    map, start, treasures = game_map()
+
+    # compile the map once, the search keeps it in sync with map
+    if args.map is not None:
+        # or play a map file, with the start and treasure nodes found on it
+        compiled, start, treasures = load_map(args.map)[:3]
+        if start is None:
+            parser.error("the map file has no player node p")
+        map = compiled.map
+    else:
+        compiled = CompiledMap(map)
+
+    # view of the map before the algorithm is run, kept without copying the map
+    i_map = compiled.snapshot()
+
+    # print map before algorithm is run
+    print_map(map)
+    print()
+
+    # to store the total energy consumption and steps taken
+    total_e = 0
+    total_s = 0
+
+    # to store the final path
     final_path = []
 
     # prioritise the closest treasure [lowest h(tsr)]
-    closest_tsr = prioritise_treasure(0.0, 0.0, treasures)
+    closest_tsr = prioritise_treasure(start[0], start[1], treasures)
     t1_effect, t2_effect, r1_effect, r2_effect = 1.0, 1.0, 1.0, 1.0
 
+    # search buffers reused for every treasure
+    state = SearchState(compiled.max_q, compiled.max_r)
+    open_list = open_list_for(args.queue or "heap")
+    heuristic = heuristic_for(args.heuristic or "euclidean")
+    expanded = 0
+    stats = SearchStats() if args.stats else None
+
+    # ask the planner for the whole visiting order up front
+    if args.planner != "greedy":
+        if args.planner == "optimal":
+            plan = plan_tour(compiled, start, treasures, state=state, time_budget=args.time_budget)
+        else:
+            plan = evaluate_orders(compiled, start, treasures)
+        if plan is None:
+            parser.error("a treasure cannot be reached")
+        treasures = list(plan[0])
+        closest_tsr = treasures[0] if len(treasures) > 0 else None
+
     # loop to find all treasure nodes
     while len(treasures) > 0:
         # A* search
         result_path, e, s, start, t1_effect, t2_effect, r1_effect, r2_effect \
-            = a_star_search(start, closest_tsr, map, t1_effect, t2_effect, r1_effect, r2_effect)
+            = a_star_search(start, closest_tsr, compiled, t1_effect, t2_effect, r1_effect, r2_effect, state,
+                            effect_aware=args.effect_aware, queue=open_list, heuristic=heuristic, stats=stats,
+                            budget=args.budget, epsilon=args.epsilon)
         final_path.append(result_path)
+        expanded += state.expanded
 
         # total up total energy and steps used
         total_e += e
@@ -504,31 +4150,46 @@ def main():
         print()
         # remove treasure from treasure list after found
         treasures.remove(closest_tsr)
-        # find the next closest treasure
-        closest_tsr = prioritise_treasure(start[0], start[1], treasures)
+        # follow the planned order or find the next closest treasure
+        if args.planner != "greedy":
+            closest_tsr = treasures[0] if len(treasures) > 0 else None
+        else:
+            closest_tsr = prioritise_treasure(start[0], start[1], treasures)
     print("All treasures obtained. Algorithm terminated.\n")
 
+    # each path after the first starts where the one before it ended
+    full_path = [n for (leg, path) in enumerate(final_path) for n in (path if leg == 0 else path[1:])]
+    viewport = None
+    if args.viewport is not None:
+        viewport = path_viewport(full_path, compiled.max_q, compiled.max_r, args.viewport)
+
     # print results
     # print initial map
     print("Initial map:")
-    print_map(i_map)
+    print_map(i_map, viewport)
     print()
 
     # print path on map
     print("Final map:")
-    print_map(map)
+    print_map(map, viewport)
 
     print("Final path:")
     # draw the final path
-    for i in final_path:
-        for n in i:
-            if not (i.index(n) == 0 and final_path.index(i) != 0):
-                print("->", n, end=" ")
-    print()
+    print_path(full_path)
+    if args.path_code:
+        print("Path code:", encode_path(full_path))
 
     print("Total energy consumed:", total_e)
     print("Total steps taken:", total_s)
     print("Total path cost:", total_e + total_s)
 
+    if args.queue is not None:
+        print("Open list:", open_list.stats())
+    if args.heuristic is not None:
+        print("Nodes expanded:", expanded)
+    if stats is not None:
+        print("Search stats:", stats.to_json())
+
 
-main()
+if __name__ == "__main__":
+    main()